@@ -0,0 +1,61 @@
+import streamlit as st
+
+import gui.st_utils as utils
+
+utils.load_values()
+
+
+def create_gradient_boosting():
+    """
+    Create the GUI for configuring Gradient Boosting parameters.
+
+    This function sets up the Streamlit container with various columns and buttons
+    to allow the user to configure the parameters for the histogram based Gradient
+    Boosting model. It includes options for max_iter, learning_rate, max_leaf_nodes,
+    max_depth, min_samples_leaf and l2_regularization. The keys of the parameters
+    the Random Forest has as well are prefixed with "hgb_".
+    """
+    with st.container(border=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            label_col, input_col = st.columns([2, 1])
+            with label_col:
+                st.button("max_iter", help="Number of boosting iterations")
+                st.button("learning_rate")
+                st.button("l2_regularization")
+            with input_col:
+                utils.int_input("max_iter", min_val=1, max_val=1000, default=200)
+                utils.float_input("learning_rate", min_val=0.01, default=0.1)
+                utils.float_input("l2_regularization", max_val=10.0, default=0.0)
+        with col2:
+            label_col, input_col = st.columns([2, 1])
+            with label_col:
+                st.button("max_leaf_nodes", key="hgb_max_leaf_nodes_label")
+                st.button("max_depth", key="hgb_max_depth_label")
+                st.button("min_samples_leaf", key="hgb_min_samples_leaf_label")
+            with input_col:
+                utils.int_input("hgb_max_leaf_nodes", min_val=2, max_val=255, default=31)
+                utils.selectbox("hgb_max_depth", [None, 3, 5, 8, 12, 20], index=0)
+                utils.int_input(
+                    "hgb_min_samples_leaf", min_val=1, max_val=200, default=20
+                )
+
+
+def get_gradient_boosting_parameters() -> dict[str, int | float | None]:
+    """
+    Retrieve the configured Gradient Boosting model parameters from session state.
+
+    This function accesses the Streamlit session state to get the current values
+    of the Gradient Boosting model parameters configured by the user.
+
+    :return: A dictionary containing the Gradient Boosting model parameters.
+    :rtype: dict[str, int | float | None]
+    """
+    return {
+        "max_iter": st.session_state.max_iter,
+        "learning_rate": st.session_state.learning_rate,
+        "l2_regularization": st.session_state.l2_regularization,
+        "max_leaf_nodes": st.session_state.hgb_max_leaf_nodes,
+        "max_depth": st.session_state.hgb_max_depth,
+        "min_samples_leaf": st.session_state.hgb_min_samples_leaf,
+    }
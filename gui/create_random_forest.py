@@ -13,7 +13,8 @@ def create_random_forest():
     to allow the user to configure the parameters for the Random Forest model.
     It includes options for n_estimators, max_depth, min_samples_leaf, max_features,
     min_impurity_decrease, random_state, warm_start, max_samples, criterion,
-    min_samples_split, min_weight_fraction_leaf, max_leaf_nodes, bootstrap, and ccp_alpha.
+    min_samples_split, min_weight_fraction_leaf, max_leaf_nodes, bootstrap, ccp_alpha,
+    and n_jobs, the number of threads the trees are trained and evaluated with.
     """
     with st.container(border=True):
         col1, col2 = st.columns(2)
@@ -27,6 +28,11 @@ def create_random_forest():
                 st.button("min_impurity_decrease")
                 st.button("random_state")
                 st.button("warm_start")
+                st.button(
+                    "n_jobs",
+                    help="Threads for training and prediction, -1 uses all, "
+                    "0 the scikit-learn default of one",
+                )
             with input_col:
                 utils.int_input("n_estimators", default=35, max_val=1000)
                 utils.int_input("max_depth", default=6, max_val=50)
@@ -35,6 +41,7 @@ def create_random_forest():
                 utils.float_input("min_impurity_decrease", default=0.0)
                 utils.selectbox("random_state", ["True", "False"])
                 utils.bool_selectbox("warm_start")
+                utils.int_input("n_jobs", min_val=-1, max_val=64, default=1)
         with col2:
             label_col, input_col = st.columns([2, 1])
             with label_col:
@@ -56,7 +63,7 @@ def create_random_forest():
                 utils.int_input("min_samples_split", default=2)
                 utils.float_input("min_weight_fraction_leaf", 0.0)
                 utils.selectbox(
-                    "max_leaf_nodes", [None, 1, 2, 3, 4, 5, 10, 15, 20], index=0
+                    "max_leaf_nodes", [None, 2, 3, 4, 5, 10, 15, 20], index=0
                 )
                 utils.bool_selectbox("bootstrap")
                 utils.float_input("ccp_alpha", default=0.0)
@@ -67,7 +74,9 @@ def get_random_forest_parameters() -> dict[str, int | str | float]:
     Retrieve the configured Random Forest model parameters from session state.
 
     This function accesses the Streamlit session state to get the current values
-    of the Random Forest model parameters configured by the user.
+    of the Random Forest model parameters configured by the user. A random_state
+    of "True" fixes the seed to 0, "False" draws a new one for every fit.
+    scikit-learn rejects n_jobs=0, it is passed as None, the default.
 
     :return: A dictionary containing the Random Forest model parameters.
     :rtype: dict[str, int | str | float]
@@ -83,8 +92,9 @@ def get_random_forest_parameters() -> dict[str, int | str | float]:
         "max_leaf_nodes": st.session_state.max_leaf_nodes,
         "min_impurity_decrease": st.session_state.min_impurity_decrease,
         "bootstrap": st.session_state.bootstrap,
-        "random_state": st.session_state.random_state,
+        "random_state": 0 if st.session_state.random_state == "True" else None,
         "warm_start": st.session_state.warm_start,
         "ccp_alpha": st.session_state.ccp_alpha,
         "max_samples": st.session_state.max_samples,
+        "n_jobs": st.session_state.n_jobs or None,
     }
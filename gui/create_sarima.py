@@ -14,6 +14,10 @@ def create_sarima_parameters():
     It includes options for trend autoregression order (p), seasonal autoregressive
     order (P), seasonal period (m), trend difference order (d), seasonal difference
     order (D), trend moving average order (q), and seasonal moving average order (Q).
+    The order selection lets the model search the orders itself, ranked by AIC or by
+    the error on a holdout, in which case only the seasonal period (m) is used.
+    Yearly seasonality is modeled by a few Fourier terms instead of a seasonal
+    period of a year.
     """
     with st.container(border=True):
         col1, col2, col3 = st.columns(3)
@@ -46,23 +50,58 @@ def create_sarima_parameters():
                 utils.int_input("q")
                 utils.int_input("Q", default=2)
 
+        st.divider()
+
+        label_col, input_col = st.columns([1, 3])
+        with label_col:
+            st.button(
+                "Yearly terms",
+                help="Number of Fourier harmonics modeling the yearly seasonality,"
+                " 0 disables them",
+            )
+        with input_col:
+            utils.int_input("yearly_fourier_terms", max_val=10)
+
+        label_col, input_col = st.columns([1, 3])
+        with label_col:
+            st.button(
+                "Order selection",
+                help="Manual uses the orders above, AIC and Holdout search the best"
+                " orders automatically",
+            )
+        with input_col:
+            utils.selectbox("order_selection", ["Manual", "AIC", "Holdout"])
+
 
 def get_sarima_parameters() -> dict[str, int]:
     """
     Retrieve the configured SARIMA model parameters from session state.
 
     This function accesses the Streamlit session state to get the current values
-    of the SARIMA model parameters configured by the user.
+    of the SARIMA model parameters configured by the user. With an automatic order
+    selection only the criterion and the seasonal period are returned.
 
     :return: A dictionary containing the SARIMA model parameters.
     :rtype: dict[str, int]
     """
-    return {
-        "order": (st.session_state.p, st.session_state.d, st.session_state.q),
-        "seasonal_order": (
-            st.session_state.P,
-            st.session_state.D,
-            st.session_state.Q,
-            st.session_state.m,
-        ),
-    }
+    if st.session_state.order_selection != "Manual":
+        params = {
+            "auto": True,
+            "criterion": st.session_state.order_selection.lower(),
+            "m": st.session_state.m,
+        }
+    else:
+        params = {
+            "order": (st.session_state.p, st.session_state.d, st.session_state.q),
+            "seasonal_order": (
+                st.session_state.P,
+                st.session_state.D,
+                st.session_state.Q,
+                st.session_state.m,
+            ),
+        }
+
+    if st.session_state.yearly_fourier_terms:
+        params["fourier"] = {365.25: st.session_state.yearly_fourier_terms}
+
+    return params
@@ -1,4 +1,3 @@
-import os
 from collections import namedtuple
 from io import StringIO
 
@@ -9,6 +8,10 @@ from streamlit_extras.add_vertical_space import add_vertical_space
 
 import gui.st_utils as utils
 import models.wrapper as wrapper
+from gui.create_gradient_boosting import (
+    create_gradient_boosting,
+    get_gradient_boosting_parameters,
+)
 from gui.create_holt_winter import (
     create_holt_winters,
     get_holt_winter_parameters,
@@ -32,6 +35,7 @@ tab_contents = {
     "Sarima": param_creator(create_params=create_sarima_parameters),
     "Random Forest": param_creator(create_params=create_random_forest),
     "Holt-Winter": param_creator(create_params=create_holt_winters),
+    "Gradient Boosting": param_creator(create_params=create_gradient_boosting),
 }
 
 PREDICT_BTN_TEXT = "PREDICT"
@@ -46,13 +50,15 @@ def _reset_models_metrics() -> None:
     """
     Reset the metrics for all models to None in the session state.
 
-    This function resets the metrics for SARIMA, Random Forest, and Holt-Winter models
-    to None in the session state, allowing for a clean start or reset of model metrics.
+    This function resets the metrics for SARIMA, Random Forest, Holt-Winter and
+    Gradient Boosting models to None in the session state, allowing for a clean start
+    or reset of model metrics.
     """
     st.session_state.metrics = {
         "Sarima": {"RMSE": None, "MAPE": None},
         "Random-Forest": {"RMSE": None, "MAPE": None},
         "Holt-Winter": {"RMSE": None, "MAPE": None},
+        "Gradient-Boosting": {"RMSE": None, "MAPE": None},
     }
 
 
@@ -68,18 +74,20 @@ def update_model_metrics(models_metrics: dict[dict[str, float]]) -> None:
         st.session_state.metrics[model_name] = metrics
 
 
-def get_model_parameters(selected_models: list[str]) -> tuple[dict, dict, dict, dict]:
+def get_model_parameters(
+    selected_models: list[str],
+) -> tuple[dict, dict, dict, dict, dict]:
     """
     Get the parameters for selected models.
 
     This function retrieves the parameters for the selected models, including SARIMA,
-    Holt-Winter, and Random Forest.
+    Holt-Winter, Random Forest and Gradient Boosting.
 
     :param selected_models: A list of selected models.
     :type selected_models: list[str]
     :return: A tuple containing the parameters for SARIMA, Holt-Winter,
-             Holt-Winter smoothing, and Random Forest models.
-    :rtype: tuple[dict, dict, dict, dict]
+             Holt-Winter smoothing, Random Forest and Gradient Boosting models.
+    :rtype: tuple[dict, dict, dict, dict, dict]
     """
     sarima_params = get_sarima_parameters() if "Sarima" in selected_models else {}
 
@@ -93,11 +101,21 @@ def get_model_parameters(selected_models: list[str]) -> tuple[dict, dict, dict,
         get_random_forest_parameters() if "Random Forest" in selected_models else {}
     )
 
-    return sarima_params, hw_params, hw_smoothing_params, rf_params
+    hgb_params = (
+        get_gradient_boosting_parameters()
+        if "Gradient Boosting" in selected_models
+        else {}
+    )
+
+    return sarima_params, hw_params, hw_smoothing_params, rf_params, hgb_params
 
 
 def generate_wrapper_params(
-    sarima_params: dict, hw_params: dict, hw_smoothing_params: dict, rf_params: dict
+    sarima_params: dict,
+    hw_params: dict,
+    hw_smoothing_params: dict,
+    rf_params: dict,
+    hgb_params: dict,
 ) -> list[pd.DataFrame | int | str | dict]:
     """
     Generate wrapper parameters for model prediction.
@@ -114,6 +132,8 @@ def generate_wrapper_params(
     :type hw_smoothing_params: dict
     :param rf_params: Parameters for Random Forest model.
     :type rf_params: dict
+    :param hgb_params: Parameters for Gradient Boosting model.
+    :type hgb_params: dict
     :return: A list containing the following parameters:
              - DataFrame: The selected data for prediction.
              - int: Number of days to predict.
@@ -122,6 +142,7 @@ def generate_wrapper_params(
              - dict: Parameters for Holt-Winters model.
              - dict: Smoothing parameters for Holt-Winters model.
              - dict: Parameters for Random Forest model.
+             - dict: Parameters for Gradient Boosting model.
     :rtype: list[pd.DataFrame | int | str | dict]
     """
     return [
@@ -132,6 +153,7 @@ def generate_wrapper_params(
         hw_params,
         hw_smoothing_params,
         rf_params,
+        hgb_params,
     ]
 
 
@@ -179,8 +201,10 @@ def handle_file_upload(file: StringIO) -> None:
 
     This function handles the upload of a CSV file, validates its contents, and updates
     the Streamlit session state accordingly. It reads the uploaded file using a utility
-    function, saves it to a designated output directory as "latest_history.csv", and
-    updates the displayed file name. If the file does not conform to expected structure
+    function into the session state and updates the displayed file name. The
+    history is written as "latest_history.csv" into the job folder of the
+    prediction and published together with its results, so sessions never
+    overwrite each other's upload. If the file does not conform to expected structure
     (i.e., lacks columns 'date' and 'occupancy'), it raises a warning message. Any
     other exceptions encountered during file reading or processing are also captured
     and result in an appropriate warning. Finally, it sets the `valid_file` flag in
@@ -195,9 +219,6 @@ def handle_file_upload(file: StringIO) -> None:
     """
     try:
         st.session_state.df = utils.read_data(file)
-        st.session_state.df.to_csv(
-            os.path.join("output", "latest_history.csv"), index=False
-        )
         utils.update_file_name(file.name)
         st.session_state.valid_file = True
     except ValueError:
@@ -404,7 +425,7 @@ with advanced_container:
     with model_input_container:
         utils.multiselect(
             "selected_models",
-            options=["Sarima", "Random Forest", "Holt-Winter"],
+            options=["Sarima", "Random Forest", "Holt-Winter", "Gradient Boosting"],
             default=["Sarima", "Random Forest", "Holt-Winter"],
         )
 
@@ -458,12 +479,16 @@ with predict_btn_col:
     if st.button(
         PREDICT_BTN_TEXT, disabled=st.session_state.is_button_disabled, type="primary"
     ):
-        sarima_params, hw_params, hw_smoothing_params, rf_params = get_model_parameters(
-            st.session_state.selected_models
-        )
+        (
+            sarima_params,
+            hw_params,
+            hw_smoothing_params,
+            rf_params,
+            hgb_params,
+        ) = get_model_parameters(st.session_state.selected_models)
 
         wrapper_params = generate_wrapper_params(
-            sarima_params, hw_params, hw_smoothing_params, rf_params
+            sarima_params, hw_params, hw_smoothing_params, rf_params, hgb_params
         )
 
         forecast_days = (
@@ -480,11 +505,12 @@ with predict_btn_col:
             with spinner_col:
                 with st.spinner(spinner_text):
                     try:
-                        metrics = wrapper.call_wrapper(wrapper_params)
+                        # Each session writes into its own job folder
+                        job = wrapper.ForecastJob.from_params(wrapper_params)
+                        metrics = job.run()
+                        job.publish()
+                        st.session_state.job_output_folder = job.output_folder
                         update_model_metrics(metrics)
-                        st.session_state.df.to_csv(
-                            os.path.join("output", "latest_history.csv"), index=False
-                        )
                         st.switch_page("pages/2_Forecast.py")
                     except ValueError:
                         st.warning("Invalid parameter combination", icon="⚠️")
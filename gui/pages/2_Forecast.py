@@ -70,16 +70,29 @@ def export_best_rmse_csv(filename_best_rmse: str) -> bytes:
     """
     Export the DataFrame of the best RMSE model to a CSV file encoded in UTF-8.
 
-    This function reads a CSV file from the 'output' directory based on the provided
-    filename of the model with the best RMSE, and converts it to a CSV file encoded in
-    UTF-8.
+    This function reads a CSV file from the output folder of the last prediction of
+    the session based on the provided filename of the model with the best RMSE, and
+    converts it to a CSV file encoded in UTF-8. Reading touches the job folder, so
+    the cleanup of old job folders keeps it. If the folder was removed anyway, the
+    published prediction in the output folder is used and a warning is shown.
 
     :param filename_best_rmse: The filename indicating the best RMSE.
     :type filename_best_rmse: str
     :return: The CSV file encoded in UTF-8.
     :rtype: bytes
     """
-    df = pd.read_csv(os.path.join("output", f"latest_{filename_best_rmse}.csv"))
+    file_name = f"latest_{filename_best_rmse}.csv"
+    job_file_path = os.path.join(st.session_state.job_output_folder, file_name)
+    if os.path.exists(job_file_path):
+        os.utime(st.session_state.job_output_folder)
+        df = pd.read_csv(job_file_path)
+    else:
+        st.warning(
+            "The results of this prediction were removed, the download contains the"
+            " latest published prediction, which may belong to another session.",
+            icon="⚠️",
+        )
+        df = pd.read_csv(os.path.join("output", file_name))
     return df.to_csv().encode("utf-8")
 
 
@@ -115,11 +128,11 @@ grafana_container = st.container()
 add_vertical_space(2)
 
 rmse_container = st.container()
-s_rmse_col, rf_rmse_col, hw_rmse_col = rmse_container.columns(3)
+s_rmse_col, rf_rmse_col, hw_rmse_col, hgb_rmse_col = rmse_container.columns(4)
 mape_container = st.container()
-s_mape_col, rf_mape_col, hw_mape_col = mape_container.columns(3)
+s_mape_col, rf_mape_col, hw_mape_col, hgb_mape_col = mape_container.columns(4)
 mae_container = st.container()
-s_mae_col, rf_mae_col, hw_mae_col = mae_container.columns(3)
+s_mae_col, rf_mae_col, hw_mae_col, hgb_mae_col = mae_container.columns(4)
 
 add_vertical_space(2)
 
@@ -169,6 +182,8 @@ with rmse_container.container():
         set_metric("Random-Forest", "RMSE")
     with hw_rmse_col:
         set_metric("Holt-Winter", "RMSE")
+    with hgb_rmse_col:
+        set_metric("Gradient-Boosting", "RMSE")
 
 with mape_container.container():
     with s_mape_col:
@@ -177,6 +192,8 @@ with mape_container.container():
         set_metric("Random-Forest", "MAPE")
     with hw_mape_col:
         set_metric("Holt-Winter", "MAPE")
+    with hgb_mape_col:
+        set_metric("Gradient-Boosting", "MAPE")
 
 with mae_container.container():
     with s_mae_col:
@@ -185,6 +202,8 @@ with mae_container.container():
         set_metric("Random-Forest", "MAE")
     with hw_mae_col:
         set_metric("Holt-Winter", "MAE")
+    with hgb_mae_col:
+        set_metric("Gradient-Boosting", "MAE")
 
 
 ########################################################################################
@@ -318,6 +318,7 @@ def set_metrics_variable() -> None:
             "Sarima": {"RMSE": None, "MAPE": None, "MAE": None},
             "Random-Forest": {"RMSE": None, "MAPE": None, "MAE": None},
             "Holt-Winter": {"RMSE": None, "MAPE": None, "MAE": None},
+            "Gradient-Boosting": {"RMSE": None, "MAPE": None, "MAE": None},
         }
 
 
@@ -408,6 +409,7 @@ def set_all_session_state_variables() -> None:
     set_session_state_variable("selected_type", SelectedType.FORECAST)
     set_session_state_variable("start_timestamp")
     set_session_state_variable("end_timestamp")
+    set_session_state_variable("job_output_folder", "output")
     set_metrics_variable()
 
 
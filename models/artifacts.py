@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import joblib
+import pandas as pd
+import sklearn
+import statsmodels
+
+from models.cache import fingerprint
+
+# Erhöhen, wenn sich der Inhalt der Artefakte ändert, alte werden dann nicht geladen
+ARTIFACT_VERSION = 3
+LIBRARY_VERSIONS = {
+    "scikit-learn": sklearn.__version__,
+    "statsmodels": statsmodels.__version__,
+}
+DEFAULT_MAX_BYTES = 1024**3
+
+
+class ArtifactStore:
+    """
+    Size bounded store of fitted models under <root>/<model>/<key>
+
+    Every artifact directory holds the pickled model in artifact.joblib and a
+    meta.json with the params, the data hash and the training window. The key
+    covers the artifact version and the scikit-learn and statsmodels versions, so
+    a fit of an older release is never loaded. The modification time of meta.json
+    is the last use, once the store grows beyond max_bytes the least recently used
+    artifacts are removed.
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def key(self, data: pd.DataFrame, model: str, **settings) -> str:
+        """
+        :param data: training data of the model
+        :param model: name of the model, e.g. "sarima"
+        :param settings: every setting that changes the fitted model
+        :return: key of the artifact
+        """
+        return fingerprint(
+            data,
+            model=model,
+            version=ARTIFACT_VERSION,
+            libraries=LIBRARY_VERSIONS,
+            **settings,
+        )
+
+    def load(self, model: str, key: str, mmap_mode: str = None):
+        """
+        :param model: name of the model
+        :param key: key of the artifact, see key
+        :param mmap_mode: e.g. "r" to map the numpy arrays of the artifact from
+            the file instead of reading them
+        :return: the stored artifact or None, an artifact that can not be
+            unpickled any more is removed
+        """
+        path = os.path.join(self.root, model, key)
+        with self._lock:
+            try:
+                artifact = joblib.load(
+                    os.path.join(path, "artifact.joblib"), mmap_mode=mmap_mode
+                )
+                os.utime(os.path.join(path, "meta.json"))
+            except FileNotFoundError:
+                return None
+            except Exception as error:
+                # z.B. AttributeError oder ModuleNotFoundError nach einem Umbau
+                print(f"Artifact {model}/{key} removed: {error!r}")
+                shutil.rmtree(path, ignore_errors=True)
+                return None
+        return artifact
+
+    def save(
+        self, model: str, key: str, artifact, data: pd.DataFrame, params: dict
+    ) -> None:
+        """
+        :param model: name of the model
+        :param key: key of the artifact, see key
+        :param artifact: picklable fitted model
+        :param data: training data with a date column
+        :param params: params the model was fitted with
+        """
+        meta = {
+            "model": model,
+            "version": ARTIFACT_VERSION,
+            "libraries": LIBRARY_VERSIONS,
+            "params": params,
+            "data_hash": fingerprint(data),
+            "training_window": {
+                "start": str(pd.Timestamp(data["date"].min()).date()),
+                "end": str(pd.Timestamp(data["date"].max()).date()),
+                "rows": len(data),
+            },
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+        path = os.path.join(self.root, model, key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            os.makedirs(tmp_path, exist_ok=True)
+            joblib.dump(artifact, os.path.join(tmp_path, "artifact.joblib"))
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump(meta, f, default=str)
+
+            # Erst vollständig schreiben, dann an die endgültige Stelle verschieben.
+            # Ein altes Artefakt wird vorher beiseitegelegt, os.replace ersetzt
+            # keine nicht leeren Verzeichnisse
+            old_path = f"{tmp_path}.old.tmp"
+            try:
+                os.rename(path, old_path)
+            except FileNotFoundError:
+                pass
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                # Ein anderer Prozess hat dasselbe Artefakt gerade gespeichert
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            shutil.rmtree(old_path, ignore_errors=True)
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def _evict(self) -> None:
+        artifacts = []
+        for model in os.listdir(self.root):
+            model_path = os.path.join(self.root, model)
+            for key in os.listdir(model_path):
+                if key.endswith(".tmp"):
+                    continue
+                path = os.path.join(model_path, key)
+                try:
+                    last_used = os.path.getmtime(os.path.join(path, "meta.json"))
+                    size = sum(entry.stat().st_size for entry in os.scandir(path))
+                except FileNotFoundError:
+                    continue
+                artifacts.append((last_used, size, path))
+
+        artifacts.sort()
+        total = sum(size for _, size, _ in artifacts)
+        # Das neueste Artefakt bleibt immer erhalten
+        for _, size, path in artifacts[:-1]:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
@@ -0,0 +1,214 @@
+import copy
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import pandas as pd
+
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 256 * 1024**2
+
+
+def fingerprint(data: pd.DataFrame | pd.Series, **settings) -> str:
+    """
+    Builds a cache key from the content of the data and the settings used on it
+
+    :param data: Pandas DataFrame or Series, index and values are hashed
+    :param settings: every setting that changes the cached result
+    :return: hex digest identifying data and settings
+    """
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ParamCache:
+    """
+    Size bounded LRU cache of JSON values, one file per key under root
+
+    Worker processes of the model pool and of the order selection share the
+    cache. Every entry is its own <root>/<key>.json, written to a temporary file
+    first and then moved into place, so processes never overwrite each other's
+    entries and a crash never leaves a half written entry behind. The
+    modification time of a file is its last use, inserting beyond max_entries
+    removes the least recently used files.
+    """
+
+    def __init__(self, root: str, max_entries: int = 256):
+        self.root = root
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """
+        :param key: cache key, see fingerprint
+        :return: the cached value or None
+        """
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path) as f:
+                    value = json.load(f)
+                os.utime(path)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return None
+            return value
+
+    def put(self, key: str, value) -> None:
+        """
+        :param key: cache key, see fingerprint
+        :param value: JSON serializable value
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            if os.path.isdir(self.root):
+                for entry in os.scandir(self.root):
+                    _remove(entry.path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def _evict(self) -> None:
+        files = []
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+
+        files.sort()
+        for _, path in files[: max(len(files) - self.max_entries, 0)]:
+            _remove(path)
+
+
+class ResultCache:
+    """
+    Two tier cache of computed results with a time to live
+
+    The memory tier is an LRU of the last max_entries results of this process.
+    Results missing there are read from <root>/<key>.joblib, which all processes
+    share, and put into the memory tier again. Entries older than ttl seconds
+    count as missing in both tiers. The modification time of a file is its last
+    use, once the files grow beyond max_bytes the least recently used ones are
+    removed. Values are copied on the way out, so callers may change them.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_entries: int = 32,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.root = root
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """
+        :param key: cache key, see fingerprint
+        :return: a copy of the cached value or None
+        """
+        now = time.time()
+        with self._lock:
+            if key in self._memory:
+                created, value = self._memory[key]
+                if now - created < self.ttl:
+                    self._memory.move_to_end(key)
+                    return copy.deepcopy(value)
+                del self._memory[key]
+
+            path = self._path(key)
+            try:
+                created, value = joblib.load(path)
+            except (FileNotFoundError, EOFError, ValueError, pickle.UnpicklingError):
+                return None
+            if now - created >= self.ttl:
+                _remove(path)
+                return None
+            os.utime(path)
+            self._remember(key, created, value)
+            return copy.deepcopy(value)
+
+    def put(self, key: str, value) -> None:
+        """
+        :param key: cache key, see fingerprint
+        :param value: picklable value
+        """
+        created = time.time()
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            joblib.dump((created, value), tmp_path)
+            os.replace(tmp_path, path)
+            self._remember(key, created, copy.deepcopy(value))
+            self._evict(created)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if os.path.isdir(self.root):
+                for entry in os.scandir(self.root):
+                    _remove(entry.path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.joblib")
+
+    def _remember(self, key: str, created: float, value) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        files = []
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".joblib"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            # Abgelaufene Einträge werden nie mehr gelesen
+            if now - stat.st_mtime >= self.ttl:
+                _remove(entry.path)
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        # Der neueste Eintrag bleibt immer erhalten
+        for _, size, path in files[:-1]:
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+
+
+# Andere Prozesse teilen sich den Ordner und können schneller gewesen sein
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
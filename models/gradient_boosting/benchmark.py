@@ -0,0 +1,84 @@
+import glob
+import os
+import pickle
+import sys
+
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, root_mean_squared_error
+
+from models.gradient_boosting.hgb import Hgb
+from models.random_forest.rf import Rf
+
+PREDICT_RANGE = 30
+
+
+def benchmark(
+    paths: list[str],
+    predict_range: int = PREDICT_RANGE,
+    rf_params: dict = None,
+    hgb_params: dict = None,
+) -> pd.DataFrame:
+    """
+    Fits Rf and Hgb on every series without its last predict_range days and
+    scores both on these days
+
+    :param paths: CSV files with date and occupancy, e.g. output/landkreise/*.csv,
+        days without occupancy are dropped
+    :param predict_range: number of held out days
+    :param rf_params: params of Rf, default its reset_params
+    :param hgb_params: params of Hgb, default its reset_params
+    :return: one row per file and model with fit and predict seconds, the size of
+        the stored artifact in bytes, RMSE and MAE
+    """
+    models = {
+        "Random-Forest": lambda train: Rf(train.copy(), predict_range, rf_params or {}),
+        "Gradient-Boosting": lambda train: Hgb(train, predict_range, hgb_params or {}),
+    }
+    rows = []
+    for path in paths:
+        data = pd.read_csv(path, usecols=["date", "occupancy"], parse_dates=["date"])
+        # Einzelne Landkreise haben Tage ohne Meldung
+        data = data.dropna(subset=["occupancy"])
+        train, test = data.iloc[:-predict_range], data.iloc[-predict_range:]
+        for name, build in models.items():
+            model = build(train)
+            prediction = model.predict()
+            rows.append(
+                {
+                    "file": os.path.basename(path),
+                    "model": name,
+                    "fit_seconds": model.fit_seconds,
+                    "predict_seconds": model.predict_seconds,
+                    "artifact_bytes": len(pickle.dumps(model.artifact())),
+                    "RMSE": root_mean_squared_error(
+                        test["occupancy"], prediction["occupancy"]
+                    ),
+                    "MAE": mean_absolute_error(
+                        test["occupancy"], prediction["occupancy"]
+                    ),
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # Optional: Anzahl der Landkreise, sonst alle
+    paths = sorted(glob.glob(os.path.join("output", "landkreise", "*.csv")))
+    if len(sys.argv) > 1:
+        paths = paths[: int(sys.argv[1])]
+
+    results = benchmark(paths)
+    summary = results.groupby("model").agg(
+        fit_seconds=("fit_seconds", "sum"),
+        predict_seconds=("predict_seconds", "sum"),
+        artifact_mb=("artifact_bytes", lambda size: size.mean() / 1024**2),
+        mean_rmse=("RMSE", "mean"),
+        mean_mae=("MAE", "mean"),
+    )
+    wins = results.pivot(index="file", columns="model", values="RMSE")
+    print(f"{len(paths)} Landkreise, {PREDICT_RANGE} days held out")
+    print(summary.to_string(float_format="%.3f"))
+    print(
+        "Gradient-Boosting lower RMSE in "
+        f"{(wins['Gradient-Boosting'] < wins['Random-Forest']).sum()} of {len(wins)}"
+    )
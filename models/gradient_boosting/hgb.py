@@ -0,0 +1,109 @@
+import time
+
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from models.random_forest.features import calendar_features, future_dates
+
+
+class Hgb:
+    """
+    Histogram based gradient boosting on the calendar features of the Random Forest
+
+    The features are binned into at most 255 values once, every boosting iteration
+    adds one tree of at most max_leaf_nodes leaves, so fit time and model size are
+    bounded by max_iter instead of growing with the depth of unrestricted trees.
+    """
+
+    def __init__(self, data: pd.DataFrame, predict_range: int, hgb_params: dict):
+        # get the params passed by the wrapper script
+        self.predict_range = predict_range
+        self.reset_params()
+        self.set_params(hgb_params)
+        # fitted HistGradientBoostingRegressor, set by predict or restore
+        self.model = None
+        # seconds spent in the last fit and prediction, see timing_report
+        self.fit_seconds = None
+        self.predict_seconds = None
+        self.put_dataset(data)
+
+    def predict(self):
+        """
+        Predicts the occupancy for the specified time range
+        :return: Pandas DataFrame with predicted occupancy for each date in the time range
+        """
+        if self.model is None:
+            start = time.perf_counter()
+            self.model = HistGradientBoostingRegressor(**self.hgb_params)
+            self.model.fit(self.x, self.y)
+            self.fit_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        prediction_dates = future_dates(self.latest_date, self.predict_range)
+        future_predictions = self.model.predict(calendar_features(prediction_dates))
+        self.predict_seconds = time.perf_counter() - start
+        return pd.DataFrame(
+            {"date": prediction_dates, "occupancy": future_predictions.astype(int)}
+        )
+
+    def timing_report(self):
+        """
+        Summarizes the cost of the last fit and prediction
+        :return: String with boosting iterations and seconds per phase
+        """
+        fit = (
+            f"fit {self.fit_seconds:.2f} s"
+            if self.fit_seconds is not None
+            else "fit loaded from artifact"
+        )
+        return (
+            f"Gradient-Boosting {self.hgb_params['max_iter']} iterations, "
+            f"max_leaf_nodes {self.hgb_params['max_leaf_nodes']}: {fit}, "
+            f"predict {self.predict_seconds:.3f} s"
+        )
+
+    def artifact(self):
+        """
+        :return: the fitted model, see restore
+        """
+        return {"model": self.model}
+
+    def restore(self, artifact):
+        """
+        Continues from a stored model, predict then only predicts
+        :param artifact: as returned by artifact
+        """
+        self.model = artifact["model"]
+
+    def put_dataset(self, dataset):
+        """
+        Used to change the dataset for the model
+        :param dataset: Pandas Dataframe with date and occupancy
+        """
+        dates = pd.DatetimeIndex(dataset["date"])
+        self.latest_date = dates.max()
+        self.x = calendar_features(dates)
+        self.y = dataset["occupancy"].to_numpy()
+        self.model = None
+
+    def get_params(self):
+        return self.hgb_params
+
+    def set_params(self, params: {}):
+        if len(params) > 0:
+            for key, val in params.items():
+                self.hgb_params[key] = val
+
+    def reset_params(self):
+        self.hgb_params = {
+            "loss": "squared_error",
+            "learning_rate": 0.1,
+            "max_iter": 200,
+            "max_leaf_nodes": 31,
+            "max_depth": None,
+            "min_samples_leaf": 20,
+            "l2_regularization": 0.0,
+            "max_bins": 255,
+            # Ohne Early Stopping wird immer gleich viel gefittet, ohne Holdout
+            "early_stopping": False,
+            "random_state": 0,
+        }
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
+import json
 import time
+from concurrent.futures import ProcessPoolExecutor
 from statsmodels.tsa.holtwinters import ExponentialSmoothing
 from sklearn.metrics import (
     mean_absolute_error,
@@ -8,9 +10,10 @@ from sklearn.metrics import (
     mean_absolute_percentage_error,
     mean_squared_error,
 )
-import pymannkendall as mk
 from scipy import stats
 
+from models.cache import ParamCache, fingerprint
+
 DEFAULT_PARAMS = {
     "trend": "add",
     "damped_trend": False,
@@ -25,6 +28,752 @@ DEFAULT_SMOOTHING_PARAMS = {
     "smoothing_seasonal": 0.0
 }
 
+# Anzahl der Kandidaten, die der Kernel gleichzeitig berechnet
+BATCH_SIZE = 4096
+
+# Budget und Seed der zufälligen Suchstrategien
+DEFAULT_MAX_EVALUATIONS = 2000
+SEARCH_SEED = 0
+
+
+def smoothing_grid(trend: bool, seasonal: bool, step: float = 0.01):
+    """
+    Builds the smoothing parameter grid searched by optimal_smoothing_params
+
+    The candidates are ordered like the nested level/trend/seasonal loops, so the
+    first minimum over the grid is the result the loops would have found. The
+    loops used trend and seasonal, the results of the pre-tests, as their loop
+    variables as well. Once a trend or seasonal range had been looped over, the
+    test result was overwritten by a smoothing value, so every later level only
+    got 0.0. The grid keeps exactly these candidates.
+
+    Returns:
+        tuple: Arrays of smoothing levels, trends and seasonals
+    """
+    levels, trends, seasonals = [], [], []
+
+    for level in np.arange(0.00, 0.98, step):
+        smoothing_trends = np.arange(0.00, level, step) if trend else [0.00]
+        if len(smoothing_trends) == 0:
+            continue
+        trend = False
+        for smoothing_trend in smoothing_trends:
+            if seasonal:
+                smoothing_seasonals = np.arange(0.00, 1 - level, step)
+            else:
+                smoothing_seasonals = [0.00]
+            seasonal = False
+            for smoothing_seasonal in smoothing_seasonals:
+                levels.append(level)
+                trends.append(smoothing_trend)
+                seasonals.append(smoothing_seasonal)
+
+    return np.array(levels), np.array(trends), np.array(seasonals)
+
+
+def full_smoothing_grid(trend: bool, seasonal: bool, step: float = 0.01):
+    """
+    Builds the full level x trend x seasonal grid the nested loops were meant to
+    search: every level with all trends below it if the data has a trend and all
+    seasonals up to 1 - level if it is seasonal
+
+    Returns:
+        tuple: Arrays of smoothing levels, trends and seasonals
+    """
+    levels, trends, seasonals = [], [], []
+
+    for level in np.arange(0.00, 0.98, step):
+        smoothing_trends = np.arange(0.00, level, step) if trend else [0.00]
+        for smoothing_trend in smoothing_trends:
+            if seasonal:
+                smoothing_seasonals = np.arange(0.00, 1 - level, step)
+            else:
+                smoothing_seasonals = [0.00]
+            for smoothing_seasonal in smoothing_seasonals:
+                levels.append(level)
+                trends.append(smoothing_trend)
+                seasonals.append(smoothing_seasonal)
+
+    return np.array(levels), np.array(trends), np.array(seasonals)
+
+
+# "baseline" behält die Ergebnisse der ursprünglichen Grid Search
+SEARCH_SPACES = {
+    "baseline": smoothing_grid,
+    "full": full_smoothing_grid,
+}
+
+
+def supports_batch(model: ExponentialSmoothing):
+    """
+    Checks whether forecast_batch reproduces the given model
+
+    Returns:
+        Boolean: True if the model is undamped and not Box-Cox transformed
+    """
+    return not model.damped_trend and not model._use_boxcox
+
+
+def smooth_batch(
+    y: np.ndarray,
+    initial_level: float,
+    initial_trend: float,
+    initial_seasons,
+    smoothing_levels: np.ndarray,
+    smoothing_trends: np.ndarray,
+    smoothing_seasonals: np.ndarray,
+    trend: str = None,
+    seasonal: str = None,
+    seasonal_periods: int = None,
+    lengths: np.ndarray = None,
+    observed: np.ndarray = None,
+):
+    """
+    Runs the Holt-Winters recursion for many smoothing triples at once
+
+    Follows the update equations of statsmodels' ExponentialSmoothing operation by
+    operation. Starting from a saved state instead of the initial values continues
+    the recursion exactly where it stopped.
+
+    y is either one series shared by all candidates or an array of shape
+    (nobs, n_candidates) with one series per candidate, the initial values may be
+    given per candidate as well. With lengths the state of candidate j stays
+    fixed after lengths[j] observations, so series of different length can run
+    in one pass. Where observed (same shape as y) is False the step only carries
+    the state forward, like a one step forecast without correction.
+
+    Returns:
+        tuple: Final levels and trends per candidate and the seasonal factors with
+        shape (len(y) + m, n_candidates), row t holds the factor at time t
+    """
+    alpha = np.asarray(smoothing_levels, dtype=float)
+    beta = np.asarray(smoothing_trends, dtype=float)
+    gamma = np.asarray(smoothing_seasonals, dtype=float)
+    alphac = 1 - alpha
+    betac = 1 - beta
+    gammac = 1 - gamma
+
+    has_trend = trend is not None
+    trended = {"mul": np.multiply, "add": np.add, None: lambda l, b: l}[trend]
+    detrend = {"mul": np.divide, "add": np.subtract}.get(trend)
+
+    nobs = len(y)
+    m = seasonal_periods if seasonal is not None else 1
+    lvl = np.array(np.broadcast_to(np.asarray(initial_level, dtype=float), alpha.shape))
+    b = np.array(
+        np.broadcast_to(
+            np.asarray(initial_trend if has_trend else 0.0, dtype=float), alpha.shape
+        )
+    )
+    s = np.zeros((nobs + m, len(alpha)))
+    if seasonal is not None:
+        seasons = np.asarray(initial_seasons, dtype=float)
+        s[:m] = seasons[:, None] if seasons.ndim == 1 else seasons
+
+    for i in range(1, nobs + 1):
+        prev_trended = trended(lvl, b)
+        if seasonal == "mul":
+            new_lvl = alpha * y[i - 1] / s[i - 1] + alphac * prev_trended
+            s[i + m - 1] = gamma * y[i - 1] / prev_trended + gammac * s[i - 1]
+        elif seasonal == "add":
+            new_lvl = alpha * y[i - 1] - alpha * s[i - 1] + alphac * prev_trended
+            s[i + m - 1] = (
+                gamma * y[i - 1] - gamma * prev_trended + gammac * s[i - 1]
+            )
+        else:
+            new_lvl = alpha * y[i - 1] + alphac * prev_trended
+        if has_trend:
+            new_b = beta * detrend(new_lvl, lvl) + betac * b
+        else:
+            new_b = b
+        if observed is not None:
+            seen = observed[i - 1]
+            new_lvl = np.where(seen, new_lvl, prev_trended)
+            new_b = np.where(seen, new_b, b)
+            s[i + m - 1] = np.where(seen, s[i + m - 1], s[i - 1])
+        if lengths is not None:
+            active = i <= lengths
+            new_lvl = np.where(active, new_lvl, lvl)
+            new_b = np.where(active, new_b, b)
+        lvl, b = new_lvl, new_b
+
+    return lvl, b, s
+
+
+def forecast_from_state(
+    level: np.ndarray,
+    trend_state: np.ndarray,
+    seasons: np.ndarray,
+    trend: str = None,
+    seasonal: str = None,
+    seasonal_periods: int = None,
+    steps: int = 30,
+):
+    """
+    Forecasts from the state the recursion ended in
+
+    seasons holds the m + 1 seasonal factors of the times nobs - 1 to nobs + m - 1,
+    which is all statsmodels reads for the forecast: it overwrites the last factor
+    and repeats the factors from time nobs - 1 on.
+
+    Returns:
+        np.ndarray: Forecasts with shape (n_candidates, steps)
+    """
+    horizon = np.arange(1, steps + 1)
+    if trend == "mul":
+        forecast = level[:, None] * trend_state[:, None] ** horizon
+    elif trend == "add":
+        forecast = level[:, None] + trend_state[:, None] * horizon
+    else:
+        forecast = np.repeat(level[:, None], steps, axis=1)
+
+    if seasonal is None:
+        return forecast
+
+    m = seasonal_periods
+    rows = np.array([k + 1 if k < m - 1 else (k - m + 1) % m for k in range(steps)])
+    if seasonal == "mul":
+        return forecast * seasons[rows].T
+    return forecast + seasons[rows].T
+
+
+def forecast_batch(
+    y: np.ndarray,
+    initial_level: float,
+    initial_trend: float,
+    initial_seasons,
+    smoothing_levels: np.ndarray,
+    smoothing_trends: np.ndarray,
+    smoothing_seasonals: np.ndarray,
+    trend: str = None,
+    seasonal: str = None,
+    seasonal_periods: int = None,
+    steps: int = 30,
+):
+    """
+    Forecasts many smoothing triples at once
+
+    Every row equals the forecast of ExponentialSmoothing(...).fit(...,
+    optimized=False).forecast(steps) for the same smoothing parameters.
+
+    Returns:
+        np.ndarray: Forecasts with shape (n_candidates, steps)
+    """
+    level, trend_state, s = smooth_batch(
+        y,
+        initial_level,
+        initial_trend,
+        initial_seasons,
+        smoothing_levels,
+        smoothing_trends,
+        smoothing_seasonals,
+        trend=trend,
+        seasonal=seasonal,
+        seasonal_periods=seasonal_periods,
+    )
+    return forecast_from_state(
+        level,
+        trend_state,
+        s[len(y) - 1 :],
+        trend=trend,
+        seasonal=seasonal,
+        seasonal_periods=seasonal_periods,
+        steps=steps,
+    )
+
+
+def update_state(state: dict, new_data: pd.DataFrame):
+    """
+    Applies the Holt-Winters update equations to the rows after the state
+
+    Only rows dated after state["last_date"] are used, they have to continue the
+    series day by day. The work is O(new rows), the smoothing params of the state
+    are kept.
+
+    :param state: state as returned by holtwinters.fit_state or update_state
+    :param new_data: Pandas DataFrame with date and occupancy
+    :return: the advanced state
+    """
+    last_date = pd.Timestamp(state["last_date"])
+    new_rows = new_data[new_data["date"] > last_date].sort_values("date")
+    if new_rows.empty:
+        return state
+
+    expected_dates = pd.date_range(
+        last_date + pd.DateOffset(days=1), periods=len(new_rows), freq="D"
+    )
+    if not (pd.DatetimeIndex(new_rows["date"]) == expected_dates).all():
+        raise ValueError(
+            f"New rows must continue the series daily after {last_date.date()}"
+        )
+
+    params = state["params"]
+    smoothing_params = state["smoothing_params"]
+    y = new_rows["occupancy"].to_numpy(dtype=float)
+    level, trend_state, s = smooth_batch(
+        y,
+        state["level"],
+        state["trend"],
+        state["seasons"][1:],
+        [smoothing_params["smoothing_level"]],
+        [smoothing_params.get("smoothing_trend") or 0.0],
+        [smoothing_params.get("smoothing_seasonal") or 0.0],
+        trend=params.get("trend"),
+        seasonal=params.get("seasonal"),
+        seasonal_periods=params.get("seasonal_periods"),
+    )
+
+    return dict(
+        state,
+        last_date=str(expected_dates[-1].date()),
+        level=float(level[0]),
+        trend=float(trend_state[0]),
+        seasons=s[len(y) - 1 :, 0].tolist() if params.get("seasonal") else [],
+    )
+
+
+def forecast_state(state: dict, steps: int = 30):
+    """
+    Forecasts the days after state["last_date"] without touching the history
+
+    :param state: state as returned by holtwinters.fit_state or update_state
+    :param steps: number of days to forecast
+    :return: Pandas DataFrame with date and occupancy
+    """
+    params = state["params"]
+    prediction = forecast_from_state(
+        np.array([state["level"]]),
+        np.array([state["trend"]]),
+        np.array(state["seasons"])[:, None],
+        trend=params.get("trend"),
+        seasonal=params.get("seasonal"),
+        seasonal_periods=params.get("seasonal_periods"),
+        steps=steps,
+    )[0]
+    dates = pd.date_range(
+        pd.Timestamp(state["last_date"]) + pd.DateOffset(days=1),
+        periods=steps,
+        freq="D",
+    )
+    return pd.DataFrame({"date": dates, "occupancy": prediction.astype(int)})
+
+
+def save_state(state: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(state, f)
+
+
+def load_state(path: str):
+    with open(path) as f:
+        return json.load(f)
+
+
+def mape_batch(y_true: np.ndarray, predictions: np.ndarray):
+    """
+    Mean absolute percentage error of every row of predictions against y_true
+
+    Uses the same epsilon guard as sklearn's mean_absolute_percentage_error.
+    Candidates whose forecast is not finite score infinity.
+
+    Returns:
+        np.ndarray: MAPE per row
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    epsilon = np.finfo(np.float64).eps
+    errors = np.abs(predictions - y_true) / np.maximum(np.abs(y_true), epsilon)
+    mape = errors.mean(axis=1)
+    return np.where(np.isfinite(mape), mape, np.inf)
+
+
+def grid_scores(
+    train: pd.Series,
+    test: pd.Series,
+    params: dict,
+    levels: np.ndarray,
+    trends: np.ndarray,
+    seasonals: np.ndarray,
+    predict_range: int,
+):
+    """
+    Scores smoothing candidates by the MAPE of their forecast on the test data
+
+    Box-Cox is not vectorized, those models are fitted by statsmodels once per
+    candidate like in the original grid search. Damped models are not supported,
+    a fit with optimized=False needs a damping_trend the grid does not have, see
+    optimizer_smoothing_params.
+
+    Returns:
+        np.ndarray: MAPE for every (level, trend, seasonal) candidate
+    """
+    model = ExponentialSmoothing(train, **params)
+    if model.damped_trend:
+        raise ValueError("The grid search needs an undamped model")
+    if not supports_batch(model):
+        return fit_scores(train, test, params, levels, trends, seasonals, predict_range)
+    scores = np.empty(len(levels))
+
+    initial_level, initial_trend, initial_seasons = model.initial_values()
+    for start in range(0, len(levels), BATCH_SIZE):
+        block = slice(start, start + BATCH_SIZE)
+        predictions = forecast_batch(
+            model.endog.squeeze(),
+            initial_level,
+            initial_trend,
+            initial_seasons,
+            levels[block],
+            trends[block],
+            seasonals[block],
+            trend=model.trend,
+            seasonal=model.seasonal,
+            seasonal_periods=model.seasonal_periods,
+            steps=predict_range,
+        )
+        scores[block] = mape_batch(test.values, predictions)
+
+    return scores
+
+
+def fit_scores(
+    train: pd.Series,
+    test: pd.Series,
+    params: dict,
+    levels: np.ndarray,
+    trends: np.ndarray,
+    seasonals: np.ndarray,
+    predict_range: int,
+):
+    """
+    Scores smoothing candidates with one statsmodels fit each, for the Box-Cox
+    models grid_scores does not vectorize
+
+    Returns:
+        np.ndarray: MAPE for every (level, trend, seasonal) candidate
+    """
+    scores = np.empty(len(levels))
+    for i, (level, trend, seasonal) in enumerate(zip(levels, trends, seasonals)):
+        model = ExponentialSmoothing(train, **params).fit(
+            smoothing_level=level,
+            smoothing_trend=trend,
+            smoothing_seasonal=seasonal,
+            optimized=False,
+        )
+        scores[i] = mean_absolute_percentage_error(
+            test, model.forecast(predict_range)
+        )
+    return np.where(np.isfinite(scores), scores, np.inf)
+
+
+def optimizer_smoothing_params(
+    train: pd.Series, test: pd.Series, params: dict, predict_range: int
+):
+    """
+    Lets statsmodels estimate the smoothing params of a damped model, or of a
+    Box-Cox model in the "full" search space
+
+    Every grid candidate would cost one statsmodels fit there, the optimizer needs
+    one fit in total. Damped models also get the estimated damping_trend, which a
+    fit with optimized=False requires.
+
+    Returns:
+        tuple: Smoothing params and the MAPE of their forecast on the test data
+    """
+    fit = ExponentialSmoothing(train, **params).fit()
+    names = ["smoothing_level", "smoothing_trend", "smoothing_seasonal"]
+    if params.get("damped_trend"):
+        names.append("damping_trend")
+    # Nicht geschätzte Komponenten sind NaN, wie in der Grid Search dann 0.0
+    smoothing_params = {
+        name: float(np.nan_to_num(fit.params.get(name), nan=0.0)) for name in names
+    }
+    score = mean_absolute_percentage_error(test, fit.forecast(predict_range))
+    return smoothing_params, float(score)
+
+
+# Zustand der Worker-Prozesse, wird einmal pro Prozess vom Initializer gesetzt
+_search_args = None
+
+
+def _init_search_worker(search_args):
+    global _search_args
+    _search_args = search_args
+
+
+def _search_level_range(bounds):
+    """
+    Scores the candidates levels[start:stop] inside a worker process
+
+    Returns:
+        tuple: Grid index and MAPE of the first best candidate in the range
+    """
+    start, stop = bounds
+    train, test, params, levels, trends, seasonals, predict_range = _search_args
+    scores = grid_scores(
+        train,
+        test,
+        params,
+        levels[start:stop],
+        trends[start:stop],
+        seasonals[start:stop],
+        predict_range,
+    )
+    best = int(np.argmin(scores))
+    return start + best, scores[best]
+
+
+def parallel_best(search_args, n_jobs: int):
+    """
+    Splits the smoothing levels of the grid across a pool of worker processes
+
+    The series and the grid reach each worker once through the pool initializer,
+    the tasks only carry index ranges of whole smoothing levels. The per-range
+    optima are reduced by (MAPE, grid index), so the result is the same candidate
+    the serial search picks.
+
+    Returns:
+        tuple: Grid index and MAPE of the best candidate, MAPE inf for an empty
+            grid
+    """
+    levels = search_args[3]
+    if len(levels) == 0:
+        return 0, np.inf
+    starts = np.flatnonzero(np.r_[True, levels[1:] != levels[:-1]])
+    # Sampling-Strategien liefern fast nur verschiedene Level, diese werden zu
+    # wenigen Tasks pro Worker zusammengefasst
+    starts = np.array(
+        [chunk[0] for chunk in np.array_split(starts, min(len(starts), n_jobs * 8))]
+    )
+    bounds = list(zip(starts.tolist(), np.r_[starts[1:], len(levels)].tolist()))
+
+    with ProcessPoolExecutor(
+        max_workers=n_jobs,
+        initializer=_init_search_worker,
+        initargs=(search_args,),
+    ) as executor:
+        results = list(executor.map(_search_level_range, bounds))
+
+    best, best_score = min(results, key=lambda result: (result[1], result[0]))
+    return best, best_score
+
+
+def grid_search(
+    evaluate, trend: bool, seasonal: bool, max_evaluations=None, grid=smoothing_grid
+):
+    """
+    Evaluates every candidate of the 0.01 smoothing grid
+
+    Returns:
+        tuple: Best smoothing params, their MAPE and the number of evaluations
+    """
+    candidates = grid(trend, seasonal)
+    best_params, best_score = evaluate(*candidates)
+    return best_params, best_score, len(candidates[0])
+
+
+def coarse_to_fine_search(
+    evaluate, trend: bool, seasonal: bool, max_evaluations=None, grid=smoothing_grid
+):
+    """
+    Evaluates a 0.1 grid, then the 0.01 grid within one coarse step of its best
+    candidate
+
+    Returns:
+        tuple: Best smoothing params, their MAPE and the number of evaluations
+    """
+    coarse = grid(trend, seasonal, step=0.1)
+    best_params, best_score = evaluate(*coarse)
+    evaluations = len(coarse[0])
+    if not best_params:
+        return best_params, best_score, evaluations
+
+    levels, trends, seasonals = grid(trend, seasonal)
+    radius = 0.1 + 1e-9
+    near = (
+        (np.abs(levels - best_params["smoothing_level"]) <= radius)
+        & (np.abs(trends - best_params["smoothing_trend"]) <= radius)
+        & (np.abs(seasonals - best_params["smoothing_seasonal"]) <= radius)
+    )
+    params, score = evaluate(levels[near], trends[near], seasonals[near])
+    evaluations += int(near.sum())
+
+    if score <= best_score:
+        best_params, best_score = params, score
+    return best_params, best_score, evaluations
+
+
+def random_search(
+    evaluate, trend: bool, seasonal: bool, max_evaluations=None, grid=smoothing_grid
+):
+    """
+    Evaluates a seeded random sample of the 0.01 smoothing grid
+
+    Returns:
+        tuple: Best smoothing params, their MAPE and the number of evaluations
+    """
+    if max_evaluations is None:
+        max_evaluations = DEFAULT_MAX_EVALUATIONS
+
+    levels, trends, seasonals = grid(trend, seasonal)
+    rng = np.random.default_rng(SEARCH_SEED)
+    sample = rng.choice(len(levels), min(max_evaluations, len(levels)), replace=False)
+    # Sortiert bleibt die Grid-Reihenfolge und damit der Tie-Break erhalten
+    sample.sort()
+
+    best_params, best_score = evaluate(
+        levels[sample], trends[sample], seasonals[sample]
+    )
+    return best_params, best_score, len(sample)
+
+
+def latin_hypercube_search(
+    evaluate, trend: bool, seasonal: bool, max_evaluations=None, grid=smoothing_grid
+):
+    """
+    Evaluates a Latin hypercube sample of the smoothing parameter space, snapped
+    to the 0.01 grid
+
+    Trend and seasonal are sampled as fractions of their upper bounds (level and
+    1 - level), so every sample satisfies the constraints of the full grid. The
+    sample always covers the full space, grid is not used.
+
+    Returns:
+        tuple: Best smoothing params, their MAPE and the number of evaluations
+    """
+    if max_evaluations is None:
+        max_evaluations = DEFAULT_MAX_EVALUATIONS
+
+    sample = stats.qmc.LatinHypercube(d=3, seed=SEARCH_SEED).random(max_evaluations)
+    levels = np.floor(sample[:, 0] * 98) / 100
+    trends = np.floor(sample[:, 1] * levels * 100) / 100 if trend else 0.0 * levels
+    if seasonal:
+        seasonals = np.floor(sample[:, 2] * (1 - levels) * 100) / 100
+    else:
+        seasonals = 0.0 * levels
+
+    levels, trends, seasonals = np.unique(
+        np.column_stack([levels, trends, seasonals]), axis=0
+    ).T
+    best_params, best_score = evaluate(levels, trends, seasonals)
+    return best_params, best_score, len(levels)
+
+
+SEARCH_STRATEGIES = {
+    "grid": grid_search,
+    "coarse_to_fine": coarse_to_fine_search,
+    "random": random_search,
+    "latin_hypercube": latin_hypercube_search,
+}
+
+
+def inversion_count(ranks: np.ndarray):
+    """
+    Counts the pairs i < j with ranks[i] > ranks[j] by a bottom-up merge sort
+
+    Every merge level is vectorized: the sorted left halves of all blocks are
+    searched at once, keys are offset per block so searches stay inside their
+    block. O(n log n) instead of comparing all pairs.
+
+    Returns:
+        int: Number of inversions
+    """
+    n = len(ranks)
+    size = 1 << max(n - 1, 0).bit_length()
+    # Auffüllen mit einem Rang über allen anderen erzeugt keine Inversionen
+    keys = np.full(size, n, dtype=np.int64)
+    keys[:n] = ranks
+    inversions = 0
+
+    width = 1
+    while width < size:
+        blocks = keys.reshape(-1, 2, width)
+        offsets = np.arange(len(blocks), dtype=np.int64)[:, None] * (n + 1)
+        left = (blocks[:, 0] + offsets).ravel()
+        right = (blocks[:, 1] + offsets).ravel()
+        not_greater = np.searchsorted(left, right, side="right")
+        block_starts = np.repeat(np.arange(len(blocks)) * width, width)
+        inversions += int((width - (not_greater - block_starts)).sum())
+        keys = np.sort(keys.reshape(-1, 2 * width), axis=1).ravel()
+        width *= 2
+
+    return inversions
+
+
+def mann_kendall_trend(x: np.ndarray, alpha: float = 0.05):
+    """
+    Mann-Kendall trend test with the decision of pymannkendall.original_test
+
+    S is counted from the inversions and ties of the ranks instead of all n^2
+    pairs, variance, z and the decision follow pymannkendall step by step.
+
+    Returns:
+        String: "increasing", "decreasing" or "no trend"
+    """
+    x = np.asarray(x, dtype=float)
+    x = x[~np.isnan(x)]
+    n = len(x)
+
+    unique_x, ranks, counts = np.unique(x, return_inverse=True, return_counts=True)
+    pairs = n * (n - 1) // 2
+    tied_pairs = int((counts * (counts - 1) // 2).sum())
+    discordant = inversion_count(ranks)
+    s = pairs - tied_pairs - 2 * discordant
+
+    if n == len(unique_x):
+        var_s = (n * (n - 1) * (2 * n + 5)) / 18
+    else:
+        tp = counts.astype(float)
+        var_s = (n * (n - 1) * (2 * n + 5) - np.sum(tp * (tp - 1) * (2 * tp + 5))) / 18
+
+    if s > 0:
+        z = (s - 1) / np.sqrt(var_s)
+    elif s == 0:
+        z = 0
+    else:
+        z = (s + 1) / np.sqrt(var_s)
+
+    h = abs(z) > stats.norm.ppf(1 - alpha / 2)
+    if z < 0 and h:
+        return "decreasing"
+    elif z > 0 and h:
+        return "increasing"
+    return "no trend"
+
+
+def grouped_kruskal_pvalue(values: np.ndarray, groups: np.ndarray):
+    """
+    Kruskal-Wallis H-test over the groups in one pass
+
+    Same statistic as stats.kruskal(*[values[groups == g] for g in ...]), the rank
+    sums per group come from one bincount instead of filtering per group.
+
+    Returns:
+        float: p-value of the test
+    """
+    values = np.asarray(values, dtype=float)
+    codes, group_index = np.unique(np.asarray(groups), return_inverse=True)
+    if len(codes) < 2:
+        raise ValueError("Need at least two groups in stats.kruskal()")
+
+    # NaN propagiert wie in stats.kruskal
+    if np.isnan(values).any():
+        return np.nan
+
+    ranked = stats.rankdata(values)
+    totaln = float(len(values))
+    _, ties = np.unique(ranked, return_counts=True)
+    ties = ties.astype(float)
+    tie_correction = 1 - np.sum(ties**3 - ties) / (totaln**3 - totaln)
+    if tie_correction == 0:
+        raise ValueError("All numbers are identical in kruskal")
+
+    rank_sums = np.bincount(group_index, weights=ranked)
+    group_sizes = np.bincount(group_index)
+    ssbn = np.sum(rank_sums**2 / group_sizes)
+
+    h = 12.0 / (totaln * (totaln + 1)) * ssbn - 3 * (totaln + 1)
+    h /= tie_correction
+    return stats.chi2.sf(h, len(codes) - 1)
+
+
 class holtwinters:
 
     def __init__(
@@ -33,21 +782,77 @@ class holtwinters:
         predict_range: int = 30,
         params: dict = None,
         smoothing_params: dict = None,
+        n_jobs: int = 1,
+        search: str = "grid",
+        max_evaluations: int = None,
+        cache: ParamCache = None,
+        search_space: str = "baseline",
     ):
         self.params = params
         if params is None:
             self.params = DEFAULT_PARAMS.copy()
 
+        if search not in SEARCH_STRATEGIES:
+            raise ValueError(
+                f"Unknown search '{search}', expected one of "
+                f"{', '.join(SEARCH_STRATEGIES)}"
+            )
+        if search_space not in SEARCH_SPACES:
+            raise ValueError(
+                f"Unknown search space '{search_space}', expected one of "
+                f"{', '.join(SEARCH_SPACES)}"
+            )
+
         self.data = data.copy()
         self.data.set_index("date", inplace=True)
         self.data.index.freq = "D"
         self.predict_range = predict_range
+        self.n_jobs = n_jobs
+        self.search = search
+        self.max_evaluations = max_evaluations
+        self.search_space = search_space
+        # Ergebnis der Suche: Anzahl bewerteter Kandidaten und beste MAPE
+        self.search_evaluations = 0
+        self.search_mape = None
+        # Endzustand der Rekursion für inkrementelle Updates, siehe update
+        self.state = None
         if smoothing_params is not None:
             self.smoothing_params = smoothing_params
         else:
-            self.smoothing_params = self.optimal_smoothing_params(
+            self.smoothing_params = self.cached_smoothing_params(cache)
+
+    def cached_smoothing_params(self, cache: ParamCache = None):
+        """
+        Looks up the tuned smoothing params in the cache and only runs the search
+        on a miss
+
+        The key covers the occupancy series, the forecast range, the model params,
+        the search settings and the search space, n_jobs does not change the
+        result.
+
+        Returns:
+            dict: smoothing_level, smoothing_trend and smoothing_seasonal
+        """
+        if cache is None:
+            return self.optimal_smoothing_params(self.data, self.predict_range)
+
+        key = fingerprint(
+            self.data["occupancy"],
+            predict_range=self.predict_range,
+            params=self.params,
+            search=self.search,
+            max_evaluations=self.max_evaluations,
+            search_space=self.search_space,
+        )
+        smoothing_params = cache.get(key)
+        if smoothing_params is None:
+            smoothing_params = self.optimal_smoothing_params(
                 self.data, self.predict_range
             )
+            if smoothing_params:
+                cache.put(key, smoothing_params)
+
+        return smoothing_params
 
     def predict(self):
 
@@ -59,55 +864,159 @@ class holtwinters:
         prediction = prediction.astype(int)
         return ret
 
+    def fit_state(self):
+        """
+        Runs the recursion once over the whole history and keeps the final level,
+        trend and seasonal factors, see update_state and forecast_state
+
+        Returns:
+            dict: JSON serializable state of the fitted model
+        """
+        model = ExponentialSmoothing(self.data["occupancy"], **self.params)
+        if not supports_batch(model):
+            raise ValueError(
+                "Incremental updates need an undamped model without Box-Cox"
+            )
+
+        initial_level, initial_trend, initial_seasons = model.initial_values()
+        level, trend_state, s = smooth_batch(
+            model.endog.squeeze(),
+            initial_level,
+            initial_trend,
+            initial_seasons,
+            [self.smoothing_params["smoothing_level"]],
+            [self.smoothing_params.get("smoothing_trend") or 0.0],
+            [self.smoothing_params.get("smoothing_seasonal") or 0.0],
+            trend=model.trend,
+            seasonal=model.seasonal,
+            seasonal_periods=model.seasonal_periods,
+        )
+
+        return {
+            "last_date": str(self.data.index[-1].date()),
+            "level": float(level[0]),
+            "trend": float(trend_state[0]),
+            "seasons": s[len(self.data) - 1 :, 0].tolist() if model.seasonal else [],
+            "params": self.params,
+            "smoothing_params": self.smoothing_params,
+        }
+
+    def artifact(self):
+        """
+        Returns:
+            dict: the smoothing params and, for models that support it, the
+            final state of the recursion, see restore
+        """
+        try:
+            state = self.state if self.state is not None else self.fit_state()
+        except ValueError:
+            state = None
+        return {"smoothing_params": self.smoothing_params, "state": state}
+
+    def restore(self, artifact: dict):
+        """
+        Continues from a stored fit, construct the model with the stored
+        smoothing_params to skip the search
+        """
+        self.smoothing_params = artifact["smoothing_params"]
+        self.state = artifact["state"]
+
+    def update(self, new_data: pd.DataFrame):
+        """
+        Appends the new days to the model and forecasts without a refit, only the
+        new observations run through the update equations
+
+        :param new_data: Pandas DataFrame with date and occupancy
+        :return: Pandas DataFrame with the forecast after the last new day
+        """
+        if self.state is None:
+            self.state = self.fit_state()
+        self.state = update_state(self.state, new_data)
+
+        new_rows = new_data[new_data["date"] > self.data.index[-1]]
+        self.data = pd.concat([self.data, new_rows.set_index("date")[["occupancy"]]])
+        self.data.index.freq = "D"
+
+        return forecast_state(self.state, self.predict_range)
+
     def optimal_smoothing_params(self, data: pd.DataFrame, predict_range):
 
         seasonal = self.test_for_seasonality(data)
         trend = self.test_for_trend(data)
 
-        smoothing_levels = np.arange(0.00, 0.98, 0.01)
-
         train_data = data[0 : len(data) - predict_range]
         test_data = data[len(data) - predict_range :]
-        # Variablen für die Speicherung des besten Ergebnisses
-        best_score = float("inf")
-        best_smoothing_params = {}
-
-        # Grid Search über die Parameterbereiche
-        for level in smoothing_levels:
-            if trend is True:
-                smoothing_trends = np.arange(0.00, level, 0.01)
+
+        # Box-Cox ist nicht vektorisiert, im "baseline"-Raum mit seinen rund 200
+        # Kandidaten bleibt es aber bei einem Fit pro Kandidat wie bisher
+        model = ExponentialSmoothing(train_data["occupancy"], **self.params)
+        if model.damped_trend or (
+            not supports_batch(model) and self.search_space != "baseline"
+        ):
+            best_smoothing_params, self.search_mape = optimizer_smoothing_params(
+                train_data["occupancy"],
+                test_data["occupancy"],
+                self.params,
+                predict_range,
+            )
+            self.search_evaluations = 1
+            return best_smoothing_params
+
+        def evaluate(levels, trends, seasonals):
+            if len(levels) == 0:
+                return {}, float("inf")
+
+            search_args = (
+                train_data["occupancy"],
+                test_data["occupancy"],
+                self.params,
+                levels,
+                trends,
+                seasonals,
+                predict_range,
+            )
+
+            if self.n_jobs is not None and self.n_jobs > 1:
+                best, best_score = parallel_best(search_args, self.n_jobs)
             else:
-                smoothing_trends = [0.00]
-            for trend in smoothing_trends:
-                if seasonal is True:
-                    smoothing_seasonals = np.arange(0.00, 1 - level, 0.01)
-                else:
-                    smoothing_seasonals = [0.00]
-                for seasonal in smoothing_seasonals:
-                    model = ExponentialSmoothing(
-                        train_data["occupancy"], **self.params
-                    ).fit(
-                        smoothing_level=level,
-                        smoothing_trend=trend,
-                        smoothing_seasonal=seasonal,
-                        optimized=False,
-                    )
-                    predictions = model.forecast(predict_range)
-
-                    mape = mean_absolute_percentage_error(
-                        test_data, predictions
-                    )
-
-                    if mape < best_score:
-                        best_score = mape
-                        best_smoothing_params = {
-                            "smoothing_level": level,
-                            "smoothing_trend": trend,
-                            "smoothing_seasonal": seasonal,
-                        }
+                # np.argmin liefert den ersten Treffer, wie der strikte Vergleich
+                # der ursprünglichen Grid Search
+                scores = grid_scores(*search_args)
+                best = int(np.argmin(scores))
+                best_score = scores[best]
+
+            if not np.isfinite(best_score):
+                return {}, float("inf")
+
+            return {
+                "smoothing_level": float(levels[best]),
+                "smoothing_trend": float(trends[best]),
+                "smoothing_seasonal": float(seasonals[best]),
+            }, float(best_score)
+
+        strategy = SEARCH_STRATEGIES[self.search]
+        best_smoothing_params, self.search_mape, self.search_evaluations = strategy(
+            evaluate,
+            trend,
+            seasonal,
+            self.max_evaluations,
+            SEARCH_SPACES[self.search_space],
+        )
 
         return best_smoothing_params
 
+    def search_report(self):
+        """
+        Summarizes the smoothing parameter search of this model
+
+        Returns:
+            String: Strategy, number of evaluated candidates and best MAPE
+        """
+        return (
+            f"Holt-Winter {self.search} search: {self.search_evaluations} "
+            f"evaluations, best MAPE {self.search_mape}"
+        )
+
     def test_for_trend(self, data: pd.DataFrame):
         """
         Tests for trend in the data
@@ -115,9 +1024,9 @@ class holtwinters:
         Returns:
             Boolean: True if there is an increasing trend, False otherwise
         """
-        result = mk.original_test(data["occupancy"])
+        trend = mann_kendall_trend(data["occupancy"].values)
         # If there is no trend or the trend is decreasing, return False
-        if result.trend == "decreasing" or result.trend == "no trend":
+        if trend == "decreasing" or trend == "no trend":
             return False
         # Otherwise, return True
         else:
@@ -130,23 +1039,11 @@ class holtwinters:
         Returns:
             Boolean: True if the data is seasonal, False otherwise
         """
-        res = []
-
-        data = data.copy()
-
-        # Add month of the year as a column to the data
-        data["month"] = data.index.month
-
-        # For each unique month in the data
-        for i in data.index.month.unique():
-            # Append the occupancy data for that month to the res list
-            res.append(data[data["month"] == i]["occupancy"].values)
-
-        # Perform a Kruskal-Wallis H-test on the res list
-        result = stats.kruskal(*res)
+        # Kruskal-Wallis H-test with the months of the year as groups
+        pvalue = grouped_kruskal_pvalue(data["occupancy"].values, data.index.month)
 
         # If the p-value of the test is greater than 0.05
-        if result.pvalue > 0.05:
+        if pvalue > 0.05:
             # The data is not seasonal
             return False
         # Otherwise
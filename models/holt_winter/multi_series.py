@@ -0,0 +1,182 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+from models.holt_winter.holt_winter import (
+    DEFAULT_PARAMS,
+    DEFAULT_SMOOTHING_PARAMS,
+    forecast_from_state,
+    smooth_batch,
+)
+
+
+def load_landkreise(folder: str):
+    """
+    Reads every Landkreis CSV of the folder into one aligned array
+
+    :param folder: folder with one CSV per Landkreis, e.g. output/landkreise
+    :return: landkreis ids, the common daily DatetimeIndex, the occupancy values
+        with shape (n_series, n_days) and the mask of observed days
+    """
+    frames = [
+        pd.read_csv(
+            file,
+            usecols=["date", "landkreis_id", "occupancy"],
+            parse_dates=["date"],
+        )
+        for file in sorted(glob.glob(os.path.join(folder, "*.csv")))
+    ]
+    table = pd.concat(frames).pivot(
+        index="landkreis_id", columns="date", values="occupancy"
+    )
+    table = table.reindex(
+        columns=pd.date_range(table.columns.min(), table.columns.max(), freq="D")
+    )
+
+    values = table.to_numpy(dtype=float)
+    return table.index.to_numpy(), table.columns, values, ~np.isnan(values)
+
+
+def forecast_series(
+    values: np.ndarray,
+    mask: np.ndarray,
+    dates: pd.DatetimeIndex,
+    ids,
+    predict_range: int = 30,
+    params: dict = None,
+    smoothing_params: dict = None,
+) -> pd.DataFrame:
+    """
+    Forecasts many aligned daily series with one vectorized Holt-Winters pass
+
+    Each series may start and end on a different day. The series are shifted to
+    start together, the recursion runs for all of them at once and every series
+    is frozen after its last observed day. Missing days inside a series only carry
+    the state forward, the initial values are taken from the interpolated series.
+    For series without gaps the results equal holtwinters(...).predict() with the
+    same params and smoothing params.
+
+    :param values: occupancy with shape (n_series, n_days)
+    :param mask: True where a day is observed, same shape as values
+    :param dates: daily DatetimeIndex of the columns
+    :param ids: landkreis_id of each row
+    :param predict_range: number of days to forecast after each series' last day
+    :param params: ExponentialSmoothing params shared by all series
+    :param smoothing_params: smoothing params, each value a scalar or one value
+        per series
+    :return: Pandas DataFrame with landkreis_id, date and occupancy, series the
+        model can not be initialized for (e.g. zeros with multiplicative
+        seasonality) are left out
+    """
+    if params is None:
+        params = DEFAULT_PARAMS.copy()
+    if smoothing_params is None:
+        smoothing_params = DEFAULT_SMOOTHING_PARAMS.copy()
+    if params.get("damped_trend") or params.get("use_boxcox"):
+        raise ValueError("Batch forecasts need an undamped model without Box-Cox")
+
+    values = np.asarray(values, dtype=float)
+    observed = np.asarray(mask, dtype=bool) & ~np.isnan(values)
+    n_series, n_days = values.shape
+
+    if not observed.any(axis=1).all():
+        raise ValueError("Every series needs at least one observed day")
+
+    first = observed.argmax(axis=1)
+    last = n_days - 1 - observed[:, ::-1].argmax(axis=1)
+    lengths = last - first + 1
+
+    # Jede Reihe beginnt in Zeile 0, Tage nach ihrem Ende bleiben NaN
+    days = np.arange(n_days)
+    columns = np.minimum(first[:, None] + days, n_days - 1)
+    y = np.take_along_axis(values, columns, axis=1)
+    seen = np.take_along_axis(observed, columns, axis=1) & (days < lengths[:, None])
+    y[~seen] = np.nan
+
+    initial_levels, initial_trends, initial_seasons = [], [], []
+    valid = np.ones(n_series, dtype=bool)
+    for j, (row, length) in enumerate(zip(y, lengths)):
+        row = pd.Series(row[:length]).interpolate().to_numpy()
+        try:
+            model = ExponentialSmoothing(row, **params)
+            level, trend, seasons = model.initial_values()
+        except ValueError as e:
+            # z.B. Nullwerte bei multiplikativer Saison
+            print(f"Skipping series {ids[j]}: {e}")
+            valid[j] = False
+            continue
+        initial_levels.append(level)
+        initial_trends.append(trend if trend is not None else 0.0)
+        initial_seasons.append(seasons)
+
+    ids = np.asarray(ids)[valid]
+    first, lengths, y, seen = first[valid], lengths[valid], y[valid], seen[valid]
+    n_series = len(ids)
+
+    def per_series(name):
+        value = smoothing_params.get(name)
+        if value is None:
+            value = 0.0
+        value = np.asarray(value, dtype=float)
+        if value.ndim and len(value) == len(valid):
+            # Werte je Reihe gelten für die Reihen vor dem Aussortieren
+            value = value[valid]
+        return np.broadcast_to(value, (n_series,))
+
+    trend = params.get("trend")
+    seasonal = params.get("seasonal")
+    seasonal_periods = params.get("seasonal_periods")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        level, trend_state, s = smooth_batch(
+            y.T[: lengths.max()],
+            np.array(initial_levels),
+            np.array(initial_trends),
+            np.array(initial_seasons).T if seasonal else None,
+            per_series("smoothing_level"),
+            per_series("smoothing_trend"),
+            per_series("smoothing_seasonal"),
+            trend=trend,
+            seasonal=seasonal,
+            seasonal_periods=seasonal_periods,
+            lengths=lengths,
+            observed=seen.T[: lengths.max()],
+        )
+
+    m = seasonal_periods if seasonal else 1
+    rows = lengths[None, :] - 1 + np.arange(m + 1)[:, None]
+    seasons = np.take_along_axis(s, rows, axis=0)
+    prediction = forecast_from_state(
+        level,
+        trend_state,
+        seasons,
+        trend=trend,
+        seasonal=seasonal,
+        seasonal_periods=seasonal_periods,
+        steps=predict_range,
+    )
+
+    last_dates = dates[first + lengths - 1]
+    forecast_dates = last_dates.values[:, None] + pd.to_timedelta(
+        np.arange(1, predict_range + 1), unit="D"
+    ).values
+
+    return pd.DataFrame(
+        {
+            "landkreis_id": np.repeat(ids, predict_range),
+            "date": forecast_dates.ravel(),
+            "occupancy": prediction.astype(int).ravel(),
+        }
+    )
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.time()
+    ids, dates, values, mask = load_landkreise(os.path.join("output", "landkreise"))
+    forecasts = forecast_series(values, mask, dates, ids)
+    print(forecasts)
+    print(f"{len(ids)} Landkreise in {time.time() - start:.2f} s")
@@ -0,0 +1,61 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+FEATURE_COLUMNS = ["day_of_year", "day_of_week", "month", "year"]
+# Bäume arbeiten intern mit float32, so entfällt die Kopie beim Fit und Predict
+FEATURE_DTYPE = np.float32
+
+
+def _calendar_matrix(days: np.ndarray) -> np.ndarray:
+    """
+    Computes the calendar features of day numbers since 1970-01-01
+
+    :param days: datetime64[D] array
+    :return: C-contiguous float32 matrix with one row per day and the columns of
+        FEATURE_COLUMNS
+    """
+    years = days.astype("datetime64[Y]")
+    features = np.empty((len(days), len(FEATURE_COLUMNS)), dtype=FEATURE_DTYPE)
+    features[:, 0] = (days - years).astype(np.int64) + 1
+    # 1970-01-01 war ein Donnerstag, Montag ist 0 wie bei pandas
+    features[:, 1] = (days.astype(np.int64) + 3) % 7
+    features[:, 2] = days.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    features[:, 3] = years.astype(np.int64) + 1970
+    return features
+
+
+@functools.lru_cache(maxsize=128)
+def _daily_features(start: np.datetime64, periods: int) -> np.ndarray:
+    features = _calendar_matrix(start + np.arange(periods))
+    # Gecachte Matrizen werden geteilt und dürfen nicht verändert werden
+    features.setflags(write=False)
+    return features
+
+
+def calendar_features(dates) -> np.ndarray:
+    """
+    Builds the Random Forest features of the dates in one vectorized pass
+
+    Daily ranges without gaps are memoized by their first day and length, so
+    repeated folds and forecasts over the same range share one read-only matrix.
+
+    :param dates: DatetimeIndex, Series or array of dates
+    :return: float32 matrix with shape (len(dates), 4), columns FEATURE_COLUMNS
+    """
+    days = pd.DatetimeIndex(dates).to_numpy().astype("datetime64[D]")
+    if len(days) and (np.diff(days) == np.timedelta64(1, "D")).all():
+        return _daily_features(days[0], len(days))
+    return _calendar_matrix(days)
+
+
+def future_dates(latest_date, periods: int) -> pd.DatetimeIndex:
+    """
+    :param latest_date: last observed day
+    :param periods: number of days to forecast
+    :return: the daily dates following latest_date
+    """
+    return pd.date_range(
+        pd.Timestamp(latest_date) + pd.Timedelta(days=1), periods=periods, freq="D"
+    )
@@ -8,6 +8,8 @@ from sklearn.metrics import (
     mean_absolute_percentage_error,
 )
 
+from features import calendar_features
+
 # Variables
 # In/Out:
 occupancy_source = "../../output/cut-data.csv"
@@ -41,34 +43,23 @@ data = pd.read_csv(occupancy_source)
 data["date"] = pd.to_datetime(data["date"], format="%Y-%m-%d")
 data.set_index("date", inplace=True)
 data["target"] = data["occupancy"].astype(int)
-# Add Columns used as features
-data["day_of_year"] = data.index.dayofyear
-data["day_of_week"] = data.index.dayofweek
-data["month"] = data.index.month
-data["year"] = data.index.year
 
 # split data into features and target
-x = data[["day_of_year", "day_of_week", "month", "year"]]
+x = calendar_features(data.index)
 y = data["target"]
 # split into training and test data
-x_train = x.iloc[: x.shape[0] - target_days]
-x_test = x.iloc[x.shape[0] - target_days :]
+x_train = x[: x.shape[0] - target_days]
+x_test = x[x.shape[0] - target_days :]
 y_train = y.iloc[: x.shape[0] - target_days]
 y_test = y.iloc[x.shape[0] - target_days :]
 
 rf_model = RandomForestRegressor(**rf_regressor_params)
 rf_model.fit(x_train, y_train)
 latest_date = data.index.max()
-prediction_dates = [
-    latest_date + pd.DateOffset(days=i) for i in range(1 + target_days * -1, 1)
-]
-future_features = pd.DataFrame(index=prediction_dates, columns=x.columns)
-future_features["day_of_year"] = [date.dayofyear for date in prediction_dates]
-future_features["day_of_week"] = [date.dayofweek for date in prediction_dates]
-future_features["month"] = [date.month for date in prediction_dates]
-future_features["year"] = [date.year for date in prediction_dates]
+prediction_dates = pd.date_range(end=latest_date, periods=target_days, freq="D")
+future_features = calendar_features(prediction_dates)
 future_predictions = rf_model.predict(future_features)
-future_features["predictions"] = future_predictions.astype(int)
+predictions = pd.Series(future_predictions.astype(int), index=prediction_dates)
 
 out = "target_days = %s\nrf_regressor_params = \n" % target_days
 for k, v in rf_regressor_params.items():
@@ -78,20 +69,20 @@ for index in y_test.index:
     out += "%s,%i,%i\n" % (
         index,
         y_test.loc[index],
-        future_features["predictions"].loc[index],
+        predictions.loc[index],
     )
     print(
         "%s > expected=%i, predicted=%i"
-        % (index, y_test.loc[index], future_features["predictions"].loc[index])
+        % (index, y_test.loc[index], predictions.loc[index])
     )
 
 if out.endswith("\n"):
     out = out[:-1]
 
-rmse = root_mean_squared_error(y_test.tail(target_days), future_features["predictions"])
-mea = mean_absolute_error(y_test.tail(target_days), future_features["predictions"])
+rmse = root_mean_squared_error(y_test.tail(target_days), predictions)
+mea = mean_absolute_error(y_test.tail(target_days), predictions)
 mape = mean_absolute_percentage_error(
-    y_test.tail(target_days), future_features["predictions"]
+    y_test.tail(target_days), predictions
 )
 
 print("Root Mean Squared Error: ", rmse)
@@ -1,6 +1,15 @@
+import time
+
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 
+from models.random_forest.compact import CompactForest
+from models.random_forest.features import (
+    FEATURE_COLUMNS,
+    calendar_features,
+    future_dates,
+)
+
 
 def prepare_data(data):
     """
@@ -10,10 +19,7 @@ def prepare_data(data):
     :return: expand data with doy, dow, month, year
     """
     data.set_index("date", inplace=True)
-    data["day_of_year"] = data.index.dayofyear
-    data["day_of_week"] = data.index.dayofweek
-    data["month"] = data.index.month
-    data["year"] = data.index.year
+    data[FEATURE_COLUMNS] = calendar_features(data.index)
     return data
 
 
@@ -24,29 +30,69 @@ class Rf:
         self.predict_range = predict_range
         self.reset_params()
         self.set_params(rf_params)
+        # fitted RandomForestRegressor set by predict or CompactForest set by restore
+        self.model = None
+        # seconds spent in the last fit and prediction, see timing_report
+        self.fit_seconds = None
+        self.predict_seconds = None
 
         # split the prepared data for the model
-        self.x = data[["day_of_year", "day_of_week", "month", "year"]]
-        self.y = data["occupancy"]
+        self.x = calendar_features(self.data.index)
+        self.y = self.data["occupancy"].to_numpy()
 
     def predict(self):
         """
         Predicts the occupancy for the specified time range
         :return: Pandas DataFrame with predicted occupancy for each date in the time range
         """
-        rf_model = RandomForestRegressor()
-        rf_model.fit(self.x, self.y)
-        latest_date = self.data.index.max()
-        prediction_dates = [ latest_date + pd.DateOffset(days=i) for i in range(1, 1 + self.predict_range)]
-        future_features = pd.DataFrame(index=prediction_dates, columns=self.x.columns)
-        future_features["day_of_week"] = [date.dayofweek for date in prediction_dates]
-        future_features["day_of_year"] = [date.dayofyear for date in prediction_dates]
-        future_features["month"] = [date.month for date in prediction_dates]
-        future_features["year"] = [date.year for date in prediction_dates]
-        future_predictions = rf_model.predict(future_features)
-        future_features["occupancy"] = future_predictions.astype(int)
+        if self.model is None:
+            start = time.perf_counter()
+            self.model = RandomForestRegressor(**self.rf_regressor_params)
+            self.model.fit(self.x, self.y)
+            self.fit_seconds = time.perf_counter() - start
+        rf_model = self.model
+        start = time.perf_counter()
+        prediction_dates = future_dates(self.data.index.max(), self.predict_range)
+        future_predictions = rf_model.predict(calendar_features(prediction_dates))
+        self.predict_seconds = time.perf_counter() - start
         # Methode zur Vorhersage von Daten
-        return pd.DataFrame({"date": future_features.index, "occupancy": future_features["occupancy"].values})
+        return pd.DataFrame(
+            {"date": prediction_dates, "occupancy": future_predictions.astype(int)}
+        )
+
+    def timing_report(self):
+        """
+        Summarizes the cost of the last fit and prediction
+        :return: String with trees, worker threads and seconds per phase
+        """
+        params = self.rf_regressor_params
+        fit = (
+            f"fit {self.fit_seconds:.2f} s"
+            if self.fit_seconds is not None
+            else "fit loaded from artifact"
+        )
+        return (
+            f"Random-Forest {params['n_estimators']} trees, max_depth "
+            f"{params['max_depth']}, n_jobs {params['n_jobs']}: {fit}, "
+            f"predict {self.predict_seconds:.3f} s"
+        )
+
+    def artifact(self):
+        """
+        :return: the arrays of the fitted forest flattened into a CompactForest,
+            see restore
+        """
+        if not isinstance(self.model, CompactForest):
+            return {"compact": CompactForest.from_forest(self.model).arrays()}
+        return {"compact": self.model.arrays()}
+
+    def restore(self, artifact):
+        """
+        Continues from a stored forest, predict then only predicts with the
+        CompactForest, which gives the same predictions as the fitted forest
+        :param artifact: as returned by artifact, the arrays may be memory mapped
+        """
+        self.model = CompactForest(**artifact["compact"])
 
     def put_dataset(self, dataset):
         """
@@ -54,8 +100,9 @@ class Rf:
         :param dataset: Pandas Dataframe with date and occupancy
         """
         self.data = prepare_data(data=dataset)
-        self.x = self.data[["day_of_year", "day_of_week", "month", "year"]]
-        self.y = self.data["occupancy"]
+        self.x = calendar_features(self.data.index)
+        self.y = self.data["occupancy"].to_numpy()
+        self.model = None
         # Hier könnten weitere Vorbereitungen für das Dataset erfolgen
 
     def set_daterange(self, daterange):
@@ -0,0 +1,371 @@
+import math
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import root_mean_squared_error
+from sklearn.model_selection import ParameterGrid
+
+from models.random_forest.features import calendar_features
+
+SCHEDULERS = ("halving", "hyperband")
+HOLDOUT_DAYS = 30
+
+# Budget in Bäumen: kleinste und größte Stufe, Faktor zwischen den Stufen
+DEFAULT_MIN_ESTIMATORS = 10
+DEFAULT_MAX_ESTIMATORS = 810
+DEFAULT_ETA = 3
+SEARCH_SEED = 0
+
+# Trainingsmatrix der Worker-Prozesse, einmal pro Prozess vom Initializer gesetzt
+_search_state = None
+
+
+def parameter_configs(space: dict[str, list], max_configs: int = None) -> list[dict]:
+    """
+    Expands a parameter space into the configurations the search evaluates
+
+    :param space: dict mapping RandomForestRegressor params to lists of values,
+        n_estimators is set by the search and must not be part of it
+    :param max_configs: optional size of a seeded sample of the grid
+    :return: list of param dicts in grid order
+    """
+    if "n_estimators" in space:
+        raise ValueError("n_estimators is the search budget, remove it from the space")
+    configs = list(ParameterGrid(space))
+    if max_configs is not None and max_configs < len(configs):
+        rng = np.random.default_rng(SEARCH_SEED)
+        sample = np.sort(rng.choice(len(configs), max_configs, replace=False))
+        configs = [configs[i] for i in sample]
+    return configs
+
+
+def estimator_budgets(
+    min_estimators: int = DEFAULT_MIN_ESTIMATORS,
+    max_estimators: int = DEFAULT_MAX_ESTIMATORS,
+    eta: int = DEFAULT_ETA,
+) -> list[int]:
+    """
+    :return: the n_estimators of the rungs, growing by eta from min_estimators,
+        the last rung is max_estimators
+    """
+    rungs = int(math.floor(math.log(max_estimators / min_estimators, eta) + 1e-9))
+    budgets = [min_estimators * eta**i for i in range(rungs)]
+    return budgets + [max_estimators]
+
+
+def _share(arrays: list[np.ndarray]):
+    """
+    Copies the arrays into one shared memory block
+
+    :return: the block and (offset, shape, dtype) of every array
+    """
+    block = shared_memory.SharedMemory(
+        create=True, size=max(1, sum(array.nbytes for array in arrays))
+    )
+    specs = []
+    offset = 0
+    for array in arrays:
+        view = np.ndarray(array.shape, array.dtype, buffer=block.buf, offset=offset)
+        view[...] = array
+        specs.append((offset, array.shape, array.dtype.str))
+        offset += array.nbytes
+    return block, specs
+
+
+def _attach(name: str, specs):
+    block = shared_memory.SharedMemory(name=name)
+    arrays = []
+    for offset, shape, dtype in specs:
+        array = np.ndarray(shape, dtype, buffer=block.buf, offset=offset)
+        array.setflags(write=False)
+        arrays.append(array)
+    return block, arrays
+
+
+def score_curve(
+    x: np.ndarray, y: np.ndarray, config: dict, checkpoints: list[int], holdout: int
+) -> list[tuple[float, float]]:
+    """
+    Grows one forest without the last holdout days and scores it on them after
+    every checkpoint
+
+    The forest is fitted with warm_start, each checkpoint only adds the missing
+    trees, and only their predictions are added to the running sum. The trees
+    are drawn from the same seeded sequence as in a fresh fit, so the score at a
+    checkpoint equals the score of a forest fitted with that many trees, and the
+    whole curve costs about as much as the largest forest.
+
+    :param x: calendar features of all days
+    :param y: occupancy of all days
+    :param config: RandomForestRegressor params without n_estimators
+    :param checkpoints: ascending numbers of trees
+    :param holdout: number of days held out
+    :return: RMSE on the holdout days and the seconds spent up to each
+        checkpoint
+    """
+    start = time.perf_counter()
+    # Fester Seed, damit die Bewertung nicht von der Worker-Verteilung abhängt
+    params = {"random_state": SEARCH_SEED, **config, "n_jobs": 1, "warm_start": True}
+    model = RandomForestRegressor(**params)
+    x_test = x[-holdout:]
+    prediction_sum = np.zeros(holdout)
+    curve = []
+    grown = 0
+    for n_estimators in checkpoints:
+        model.set_params(n_estimators=n_estimators)
+        model.fit(x[:-holdout], y[:-holdout])
+        for tree in model.estimators_[grown:]:
+            prediction_sum += tree.predict(x_test)
+        grown = n_estimators
+        rmse = root_mean_squared_error(y[-holdout:], prediction_sum / n_estimators)
+        curve.append((float(rmse), time.perf_counter() - start))
+    return curve
+
+
+def score_config(
+    x: np.ndarray, y: np.ndarray, config: dict, n_estimators: int, holdout: int
+) -> tuple[float, float]:
+    """
+    Fits one forest without the last holdout days and scores it on them
+
+    :param n_estimators: number of trees, the other params see score_curve
+    :return: RMSE on the holdout days and the seconds the fit took
+    """
+    return score_curve(x, y, config, [n_estimators], holdout)[0]
+
+
+def _init_search_worker(name, specs, holdout):
+    global _search_state
+    # Der Block bleibt referenziert, solange der Worker die Views nutzt
+    block, (x, y) = _attach(name, specs)
+    _search_state = (block, x, y, holdout)
+
+
+def _score_task(task):
+    config, checkpoints = task
+    _, x, y, holdout = _search_state
+    return score_curve(x, y, config, checkpoints, holdout)
+
+
+def _training_arrays(data: pd.DataFrame, holdout: int):
+    x = calendar_features(pd.DatetimeIndex(data["date"]))
+    y = data["occupancy"].to_numpy(dtype=float)
+    if len(y) <= holdout:
+        raise ValueError("Too few observations for the holdout")
+    return x, y
+
+
+@contextmanager
+def _scoring_pool(x: np.ndarray, y: np.ndarray, holdout: int, n_jobs: int):
+    """
+    Provides a function scoring (config, checkpoints) tasks, see score_curve
+
+    With n_jobs > 1 the features and the occupancy are copied once into a shared
+    memory block, the worker processes map it through the pool initializer and
+    the tasks only carry a config and its checkpoints.
+    """
+    if n_jobs <= 1:
+        yield lambda tasks: [score_curve(x, y, *task, holdout) for task in tasks]
+        return
+
+    block, specs = _share([x, y])
+    try:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_search_worker,
+            initargs=(block.name, specs, holdout),
+        ) as executor:
+            yield lambda tasks: list(executor.map(_score_task, tasks))
+    finally:
+        block.close()
+        block.unlink()
+
+
+def successive_halving(
+    evaluate, candidates: list[int], budgets: list[int], eta: int
+) -> None:
+    """
+    Scores all candidates on the first budget, keeps the best 1/eta for the next
+
+    :param evaluate: callable taking (config index, budget) pairs and returning
+        their RMSE
+    :param candidates: config indices
+    :param budgets: n_estimators of the rungs
+    :param eta: reduction factor
+    """
+    alive = list(candidates)
+    for rung, budget in enumerate(budgets):
+        scores = evaluate([(index, budget) for index in alive])
+        if rung == len(budgets) - 1:
+            break
+        # Ties gehen an den früheren Kandidaten, unabhängig von n_jobs
+        ranked = sorted(zip(scores, alive))
+        alive = [index for _, index in ranked[: max(1, len(alive) // eta)]]
+
+
+def hyperband(
+    evaluate, n_configs: int, budgets: list[int], eta: int
+) -> None:
+    """
+    Runs successive halving brackets from aggressive to conservative
+
+    The first bracket starts many configs on the smallest budget, the last one
+    fits a few configs with the full budget right away. Every bracket draws a
+    seeded sample of the configs.
+
+    :param evaluate: see successive_halving
+    :param n_configs: number of configs in the space
+    :param budgets: n_estimators of the rungs
+    :param eta: reduction factor
+    """
+    s_max = len(budgets) - 1
+    for s in range(s_max, -1, -1):
+        n = int(math.ceil((s_max + 1) / (s + 1) * eta**s))
+        rng = np.random.default_rng(SEARCH_SEED + s)
+        sample = np.sort(rng.choice(n_configs, min(n, n_configs), replace=False))
+        successive_halving(evaluate, sample.tolist(), budgets[s_max - s :], eta)
+
+
+def search(
+    data: pd.DataFrame,
+    space: dict[str, list],
+    scheduler: str = "halving",
+    n_jobs: int = 1,
+    min_estimators: int = DEFAULT_MIN_ESTIMATORS,
+    max_estimators: int = DEFAULT_MAX_ESTIMATORS,
+    eta: int = DEFAULT_ETA,
+    holdout: int = HOLDOUT_DAYS,
+    max_configs: int = None,
+) -> pd.DataFrame:
+    """
+    Searches Random Forest hyperparameters with n_estimators as budget
+
+    Every config is fitted with few trees first, only the best 1/eta of a rung
+    get eta times as many trees in the next one, up to max_estimators. Each
+    (config, n_estimators) pair is fitted once, Hyperband brackets reuse scores
+    of pairs an earlier bracket fitted.
+
+    The features and the occupancy are copied once into a shared memory block,
+    the worker processes map it through the pool initializer, the tasks only
+    carry a config and its budget. Forests are seeded, so the table does not
+    depend on n_jobs.
+
+    :param data: Pandas DataFrame with date and occupancy
+    :param space: dict mapping RandomForestRegressor params to lists of values
+    :param scheduler: "halving" starts every config on the smallest budget,
+        "hyperband" runs brackets of halving with different starting budgets
+    :param n_jobs: number of worker processes, 1 fits in this process
+    :param min_estimators: trees of the first rung
+    :param max_estimators: trees of the last rung
+    :param eta: reduction factor between the rungs
+    :param holdout: number of last days the forests are scored on
+    :param max_configs: optional size of a seeded sample of the space
+    :return: one row per evaluated config with its params, the largest
+        n_estimators it reached, its RMSE and fit seconds there, ranked by
+        n_estimators descending and RMSE
+    """
+    if scheduler not in SCHEDULERS:
+        raise ValueError(
+            f"Unknown scheduler '{scheduler}', choose one of {', '.join(SCHEDULERS)}"
+        )
+    configs = parameter_configs(space, max_configs)
+    budgets = estimator_budgets(min_estimators, max_estimators, eta)
+    x, y = _training_arrays(data, holdout)
+
+    scores = {}
+    with _scoring_pool(x, y, holdout, n_jobs) as score:
+
+        def evaluate(tasks):
+            pending = [task for task in dict.fromkeys(tasks) if task not in scores]
+            curves = score([(configs[index], [budget]) for index, budget in pending])
+            scores.update(zip(pending, [curve[0] for curve in curves]))
+            return [scores[task][0] for task in tasks]
+
+        if scheduler == "halving":
+            successive_halving(evaluate, range(len(configs)), budgets, eta)
+        else:
+            hyperband(evaluate, len(configs), budgets, eta)
+
+    # Pro Config zählt die Bewertung mit den meisten Bäumen
+    best = {}
+    for (index, budget), (rmse, seconds) in sorted(scores.items()):
+        best[index] = (budget, rmse, seconds)
+    # object-Spalten, damit None-Werte wie max_depth=None erhalten bleiben
+    table = pd.DataFrame([configs[index] for index in best], dtype=object)
+    table["n_estimators"] = [budget for budget, _, _ in best.values()]
+    table["rmse"] = [rmse for _, rmse, _ in best.values()]
+    table["fit_seconds"] = [seconds for _, _, seconds in best.values()]
+    table["config"] = list(best)
+    table = table.sort_values(
+        ["n_estimators", "rmse", "config"], ascending=[False, True, True]
+    ).drop(columns="config")
+    table.index = pd.RangeIndex(1, len(table) + 1, name="rank")
+    return table
+
+
+def error_curves(
+    data: pd.DataFrame,
+    space: dict[str, list],
+    checkpoints: list[int],
+    n_jobs: int = 1,
+    holdout: int = HOLDOUT_DAYS,
+    max_configs: int = None,
+) -> pd.DataFrame:
+    """
+    Scores every config of the space at every number of trees in checkpoints
+
+    One forest per config is grown through the checkpoints, see score_curve, so
+    the n_estimators dimension of the sweep costs about as much as fitting the
+    largest forest once per config.
+
+    :param data: Pandas DataFrame with date and occupancy
+    :param space: dict mapping RandomForestRegressor params to lists of values
+    :param checkpoints: numbers of trees to score
+    :param n_jobs: number of worker processes, 1 fits in this process
+    :param holdout: number of last days the forests are scored on
+    :param max_configs: optional size of a seeded sample of the space
+    :return: one row per config and checkpoint with the config number, its
+        params, n_estimators, the RMSE and the seconds spent up to the checkpoint
+    """
+    configs = parameter_configs(space, max_configs)
+    checkpoints = sorted(set(checkpoints))
+    x, y = _training_arrays(data, holdout)
+
+    with _scoring_pool(x, y, holdout, n_jobs) as score:
+        curves = score([(config, checkpoints) for config in configs])
+
+    indices = np.repeat(np.arange(len(configs)), len(checkpoints))
+    table = pd.DataFrame([configs[index] for index in indices], dtype=object)
+    table.insert(0, "config", indices)
+    table["n_estimators"] = checkpoints * len(configs)
+    table["rmse"] = [rmse for curve in curves for rmse, _ in curve]
+    table["seconds"] = [seconds for curve in curves for _, seconds in curve]
+    return table
+
+
+if __name__ == "__main__":
+    import os
+
+    data = pd.read_csv(
+        os.path.join("output", "berlin.csv"),
+        usecols=["date", "occupancy"],
+        parse_dates=["date"],
+    )
+    space = {
+        "max_features": ["log2", "sqrt", 1.0],
+        "max_depth": [5, 10, 20, None],
+        "min_samples_split": [2, 5],
+        "min_samples_leaf": [1, 2, 5],
+        "bootstrap": [True, False],
+    }
+
+    for scheduler in SCHEDULERS:
+        start = time.time()
+        table = search(data, space, scheduler=scheduler, n_jobs=os.cpu_count())
+        print(table.head(10).to_string())
+        print(f"{scheduler}: {len(table)} configs in {time.time() - start:.2f} s")
@@ -8,6 +8,8 @@ from multiprocessing import Process, Queue
 import time
 import pprint
 
+from features import calendar_features
+
 
 def iterate_parameter_combinations(parameters):
     """
@@ -103,31 +105,20 @@ data = pd.read_csv(occupancy_source)
 data["date"] = pd.to_datetime(data["date"], format="%Y-%m-%d")
 data.set_index("date", inplace=True)
 data["target"] = data["occupancy"].astype(int)
-# Add Columns used as features
-data["day_of_year"] = data.index.dayofyear
-data["day_of_week"] = data.index.dayofweek
-data["month"] = data.index.month
-data["year"] = data.index.year
 
 # split data into features and target
-x = data[["day_of_year", "day_of_week", "month", "year"]]
+x = calendar_features(data.index)
 y = data["target"]
 # split into training and test data
-x_train = x.iloc[: x.shape[0] - target_days]
-x_test = x.iloc[x.shape[0] - target_days :]
+x_train = x[: x.shape[0] - target_days]
+x_test = x[x.shape[0] - target_days :]
 y_train = y.iloc[: x.shape[0] - target_days]
 y_test = y.iloc[x.shape[0] - target_days :]
 
 
 latest_date = data.index.max()
-prediction_dates = [
-    latest_date + pd.DateOffset(days=i) for i in range(1 + target_days * -1, 1)
-]
-future_features = pd.DataFrame(index=prediction_dates, columns=x.columns)
-future_features["day_of_year"] = [date.dayofyear for date in prediction_dates]
-future_features["day_of_week"] = [date.dayofweek for date in prediction_dates]
-future_features["month"] = [date.month for date in prediction_dates]
-future_features["year"] = [date.year for date in prediction_dates]
+prediction_dates = pd.date_range(end=latest_date, periods=target_days, freq="D")
+future_features = calendar_features(prediction_dates)
 
 
 latest_date = data.index.max()
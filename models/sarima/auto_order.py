@@ -0,0 +1,254 @@
+import itertools
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_percentage_error
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+from models.cache import ParamCache, fingerprint
+from models.sarima.prescreen import conditioned_observations, css_estimate
+
+CRITERIA = ("aic", "holdout")
+DEFAULT_TIMEOUT = 30.0
+HOLDOUT_DAYS = 30
+
+# Daten und Einstellungen, einmal pro Worker über den Pool-Initializer gesetzt
+_order_args = None
+
+
+class FitTimeout(Exception):
+    pass
+
+
+def candidate_orders(
+    max_p: int = 2,
+    max_d: int = 1,
+    max_q: int = 2,
+    max_P: int = 1,
+    max_D: int = 0,
+    max_Q: int = 1,
+    m: int = 7,
+) -> list[dict[str, tuple[int]]]:
+    """
+    Builds the bounded set of SARIMA orders the automatic selection evaluates
+
+    :param max_p: highest autoregressive order, max_d, max_q and the seasonal
+        max_P, max_D, max_Q bound the other orders the same way
+    :param m: seasonal period
+    :return: list of sarima_params dicts with "order" and "seasonal_order"
+    """
+    candidates = []
+    for p, d, q, P, D, Q in itertools.product(
+        range(max_p + 1),
+        range(max_d + 1),
+        range(max_q + 1),
+        range(max_P + 1),
+        range(max_D + 1),
+        range(max_Q + 1),
+    ):
+        candidates.append({"order": (p, d, q), "seasonal_order": (P, D, Q, m)})
+    return candidates
+
+
+def score_order(
+    occupancy: pd.Series,
+    sarima_params: dict[str, tuple[int]],
+    criterion: str = "aic",
+    holdout: int = HOLDOUT_DAYS,
+    timeout: float = DEFAULT_TIMEOUT,
+    start_params: np.ndarray = None,
+) -> float:
+    """
+    Fits one candidate order and scores it, lower is better
+
+    The timeout is checked after every optimizer iteration, a fit exceeding it is
+    aborted. Failed, aborted and non-finite fits score inf so they are pruned.
+
+    :param occupancy: series to fit
+    :param sarima_params: candidate with "order" and "seasonal_order"
+    :param criterion: "aic" of the fit on the whole series or "holdout", the MAPE
+        of a fit without the last holdout days on these days
+    :param holdout: number of days held out for the "holdout" criterion
+    :param timeout: seconds a single fit may take
+    :param start_params: optional start values of the MLE, e.g. CSS estimates
+    :return: AIC or holdout MAPE of the candidate
+    """
+    deadline = time.monotonic() + timeout
+
+    def check_deadline(*args):
+        if time.monotonic() > deadline:
+            raise FitTimeout()
+
+    train = occupancy.iloc[:-holdout] if criterion == "holdout" else occupancy
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model_fit = SARIMAX(
+                train.to_numpy(dtype=float),
+                order=sarima_params["order"],
+                seasonal_order=sarima_params["seasonal_order"],
+            ).fit(start_params=start_params, disp=False, callback=check_deadline)
+            if criterion == "holdout":
+                score = mean_absolute_percentage_error(
+                    occupancy.iloc[-holdout:], model_fit.forecast(steps=holdout)
+                )
+            else:
+                score = model_fit.aic
+    except Exception:
+        # z.B. FitTimeout, LinAlgError oder IndexError in statsmodels
+        return np.inf
+
+    return float(score) if np.isfinite(score) else np.inf
+
+
+def _init_order_worker(order_args):
+    global _order_args
+    _order_args = order_args
+
+
+def _score_candidate(candidate):
+    sarima_params, start_params = candidate
+    occupancy, criterion, holdout, timeout = _order_args
+    return score_order(
+        occupancy, sarima_params, criterion, holdout, timeout, start_params
+    )
+
+
+def prescreen(
+    occupancy: pd.Series, candidates: list[dict[str, tuple[int]]], top_k: int
+):
+    """
+    Ranks the candidates by their conditional sum of squares AIC
+
+    Every AIC is computed on the days left by the candidate with the most
+    differencing and burn-in, so the orders are compared on the same days.
+
+    :param occupancy: series to fit
+    :param candidates: sarima_params dicts
+    :param top_k: number of candidates to keep
+    :return: indices of the top_k candidates in candidate order and the CSS
+        estimates of every candidate, None where the estimation failed
+    """
+    aics = np.full(len(candidates), np.inf)
+    estimates = [None] * len(candidates)
+    y = occupancy.to_numpy(dtype=float)
+    n_scored = len(y) - max(map(conditioned_observations, candidates))
+    for i, candidate in enumerate(candidates):
+        try:
+            estimates[i], aics[i], _ = css_estimate(y, candidate, n_scored=n_scored)
+        except (ValueError, np.linalg.LinAlgError):
+            continue
+
+    ranked = np.argsort(aics, kind="stable")[:top_k]
+    return np.sort(ranked[np.isfinite(aics[ranked])]), estimates
+
+
+def select_order(
+    data: pd.DataFrame,
+    criterion: str = "aic",
+    candidates: list[dict[str, tuple[int]]] | None = None,
+    n_jobs: int = 1,
+    timeout: float = DEFAULT_TIMEOUT,
+    holdout: int = HOLDOUT_DAYS,
+    cache: ParamCache | None = None,
+    top_k: int | None = None,
+) -> tuple[dict[str, tuple[int]], list[tuple[dict, float]]]:
+    """
+    Picks the SARIMA order with the best score from a bounded candidate set
+
+    The candidates are fitted on a pool of n_jobs worker processes, the series
+    reaches every worker once through the pool initializer. Ties are broken by the
+    position in the candidate list, so the result does not depend on n_jobs. With
+    a cache the winning order is stored under the fingerprint of the occupancy and
+    the settings, a repeated run returns it without fitting anything.
+
+    With top_k the candidates are prescreened by conditional sum of squares
+    estimates first, only the top_k of them get the full MLE, started from their
+    CSS estimates. The others score inf. The prescreen always ranks by the CSS
+    AIC, with the "holdout" criterion it is computed without the holdout days,
+    like the fits, but the shortlist may still miss the candidate with the best
+    holdout MAPE. Pass top_k=None there to score every candidate.
+
+    :param data: Pandas DataFrame with an occupancy column
+    :param criterion: "aic" or "holdout", see score_order
+    :param candidates: sarima_params dicts to evaluate, default candidate_orders()
+    :param n_jobs: number of worker processes, 1 fits in this process
+    :param timeout: seconds a single fit may take before it is pruned
+    :param holdout: number of days held out for the "holdout" criterion
+    :param cache: optional ParamCache for the winning order
+    :param top_k: number of prescreened candidates fitted by MLE, None fits all
+    :return: the best sarima_params and the (sarima_params, score) pairs of all
+        evaluated candidates, empty on a cache hit
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(
+            f"Unknown criterion '{criterion}', choose one of {', '.join(CRITERIA)}"
+        )
+    if candidates is None:
+        candidates = candidate_orders()
+
+    occupancy = data["occupancy"].reset_index(drop=True)
+
+    key = None
+    if cache is not None:
+        key = fingerprint(
+            occupancy,
+            criterion=criterion,
+            candidates=candidates,
+            holdout=holdout,
+            top_k=top_k,
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return {name: tuple(value) for name, value in cached.items()}, []
+
+    if top_k is not None:
+        train = occupancy.iloc[:-holdout] if criterion == "holdout" else occupancy
+        shortlist, estimates = prescreen(train, candidates, top_k)
+    else:
+        shortlist, estimates = np.arange(len(candidates)), [None] * len(candidates)
+    tasks = [(candidates[i], estimates[i]) for i in shortlist]
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_order_worker,
+            initargs=((occupancy, criterion, holdout, timeout),),
+        ) as executor:
+            shortlist_scores = list(executor.map(_score_candidate, tasks))
+    else:
+        shortlist_scores = [
+            score_order(occupancy, candidate, criterion, holdout, timeout, start)
+            for candidate, start in tasks
+        ]
+
+    scores = np.full(len(candidates), np.inf)
+    scores[shortlist] = shortlist_scores
+
+    best = int(np.argmin(scores))
+    if not np.isfinite(scores[best]):
+        raise ValueError("No SARIMA candidate order could be fitted")
+
+    if cache is not None:
+        cache.put(key, candidates[best])
+
+    return candidates[best], list(zip(candidates, scores.tolist()))
+
+
+if __name__ == "__main__":
+    import os
+
+    data = pd.read_csv(
+        os.path.join("output", "berlin.csv"),
+        usecols=["date", "occupancy"],
+        parse_dates=["date"],
+    )
+
+    start = time.time()
+    params, report = select_order(data, n_jobs=os.cpu_count())
+    pruned = sum(not np.isfinite(score) for _, score in report)
+    print(f"Best order {params} of {len(report)} candidates, {pruned} pruned")
+    print(f"Selection took {time.time() - start:.2f} s")
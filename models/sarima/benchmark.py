@@ -0,0 +1,91 @@
+import glob
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, root_mean_squared_error
+
+from models.sarima.sarima import DEFAULT_PARAMS, Sarima
+
+PREDICT_RANGE = 30
+
+
+def benchmark(
+    paths: list[str],
+    predict_range: int = PREDICT_RANGE,
+    sarima_params: dict = DEFAULT_PARAMS,
+) -> pd.DataFrame:
+    """
+    Fits Sarima with and without forecast_only on every series without its last
+    predict_range days and scores both on these days
+
+    :param paths: CSV files with date and occupancy, e.g. output/landkreise/*.csv,
+        days without occupancy are dropped
+    :param predict_range: number of held out days
+    :param sarima_params: order and seasonal order of both fits
+    :return: one row per file and mode with fit and predict seconds, the peak of
+        the memory traced during the fit and the size of the pickled results in
+        bytes, RMSE and MAE
+    """
+    rows = []
+    for path in paths:
+        data = pd.read_csv(path, usecols=["date", "occupancy"], parse_dates=["date"])
+        # Einzelne Landkreise haben Tage ohne Meldung
+        data = data.dropna(subset=["occupancy"]).reset_index(drop=True)
+        train, test = data.iloc[:-predict_range], data.iloc[-predict_range:]
+        for forecast_only in (False, True):
+            model = Sarima(
+                train, predict_range, sarima_params, forecast_only=forecast_only
+            )
+
+            # Der erste Aufruf schätzt das Modell, der zweite prognostiziert nur
+            tracemalloc.start()
+            start = time.perf_counter()
+            model.predict()
+            fit_seconds = time.perf_counter() - start
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            prediction = model.predict()
+            predict_seconds = time.perf_counter() - start
+
+            rows.append(
+                {
+                    "file": os.path.basename(path),
+                    "mode": "forecast_only" if forecast_only else "full",
+                    "fit_seconds": fit_seconds,
+                    "predict_seconds": predict_seconds,
+                    "peak_bytes": peak_bytes,
+                    "results_bytes": len(pickle.dumps(model.results)),
+                    "RMSE": root_mean_squared_error(
+                        test["occupancy"], prediction["occupancy"]
+                    ),
+                    "MAE": mean_absolute_error(
+                        test["occupancy"], prediction["occupancy"]
+                    ),
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # Optional: Anzahl der Landkreise, sonst alle
+    paths = sorted(glob.glob(os.path.join("output", "landkreise", "*.csv")))
+    if len(sys.argv) > 1:
+        paths = paths[: int(sys.argv[1])]
+
+    results = benchmark(paths)
+    summary = results.groupby("mode").agg(
+        fit_seconds=("fit_seconds", "sum"),
+        predict_seconds=("predict_seconds", "sum"),
+        peak_mb=("peak_bytes", lambda size: size.mean() / 1024**2),
+        results_mb=("results_bytes", lambda size: size.mean() / 1024**2),
+        mean_rmse=("RMSE", "mean"),
+        mean_mae=("MAE", "mean"),
+    )
+    print(f"{len(paths)} Landkreise, {PREDICT_RANGE} days held out")
+    print(summary.to_string(float_format="%.3f"))
@@ -0,0 +1,171 @@
+import numpy as np
+from scipy.optimize import minimize
+from scipy.signal import lfilter
+
+# Grenze der AR- und MA-Koeffizienten während der CSS-Optimierung
+COEFFICIENT_BOUND = 0.99
+
+
+def lag_polynomial(
+    coefficients: np.ndarray, seasonal_coefficients: np.ndarray, m: int, sign: int
+) -> np.ndarray:
+    """
+    Multiplies the non-seasonal and the seasonal lag polynomial
+
+    :param coefficients: lag 1..p coefficients
+    :param seasonal_coefficients: lag m..P*m coefficients
+    :param m: seasonal period
+    :param sign: -1 for autoregressive (1 - a1 B - ...), 1 for moving average
+        polynomials (1 + b1 B + ...)
+    :return: coefficients of the product, starting at lag 0
+    """
+    polynomial = np.r_[1.0, sign * np.asarray(coefficients, dtype=float)]
+    seasonal = np.zeros(len(seasonal_coefficients) * m + 1)
+    seasonal[0] = 1.0
+    seasonal[m::m] = sign * np.asarray(seasonal_coefficients, dtype=float)
+    return np.convolve(polynomial, seasonal)
+
+
+def difference(y: np.ndarray, d: int, D: int, m: int) -> np.ndarray:
+    for _ in range(d):
+        y = y[1:] - y[:-1]
+    for _ in range(D):
+        y = y[m:] - y[:-m]
+    return y
+
+
+def lagged(x: np.ndarray, lags, start: int) -> np.ndarray:
+    return np.column_stack([x[start - lag : len(x) - lag] for lag in lags])
+
+
+def hannan_rissanen(
+    w: np.ndarray, p: int, q: int, P: int, Q: int, m: int
+) -> np.ndarray:
+    """
+    Regression estimates of the ARMA coefficients of a differenced series
+
+    A long autoregression estimates the innovations, the series is then regressed
+    on its own lags and the lagged innovations. Seasonal lags enter as separate
+    regressors, the cross terms of the multiplicative model are left out, which
+    is good enough for start values.
+
+    :return: ar, ma, seasonal ar and seasonal ma coefficients, clipped to the
+        CSS bounds
+    """
+    ar_lags = list(range(1, p + 1)) + [m * j for j in range(1, P + 1)]
+    ma_lags = list(range(1, q + 1)) + [m * j for j in range(1, Q + 1)]
+    if not ma_lags and not ar_lags:
+        return np.empty(0)
+
+    innovations = w - w.mean()
+    long_order = max(ar_lags + ma_lags + [int(np.ceil(10 * np.log10(len(w))))])
+    if ma_lags and len(w) > 4 * long_order:
+        long_lags = range(1, long_order + 1)
+        X = lagged(w, long_lags, long_order)
+        coefficients = np.linalg.lstsq(X, w[long_order:], rcond=None)[0]
+        innovations = np.r_[np.zeros(long_order), w[long_order:] - X @ coefficients]
+
+    start = long_order + max(ar_lags + ma_lags)
+    columns = []
+    if ar_lags:
+        columns.append(lagged(w, ar_lags, start))
+    if ma_lags:
+        columns.append(lagged(innovations, ma_lags, start))
+    X = np.hstack(columns)
+    coefficients = np.linalg.lstsq(X, w[start:], rcond=None)[0]
+    coefficients = np.clip(coefficients, -COEFFICIENT_BOUND, COEFFICIENT_BOUND)
+
+    ar, seasonal_ar, ma, seasonal_ma = np.split(coefficients, np.cumsum([p, P, q]))
+    return np.r_[ar, ma, seasonal_ar, seasonal_ma]
+
+
+def conditioned_observations(sarima_params: dict[str, tuple[int]]) -> int:
+    """
+    :return: number of leading observations the differencing and the burn-in of
+        css_estimate use up
+    """
+    p, d, _ = sarima_params["order"]
+    P, D, _, m = sarima_params["seasonal_order"]
+    return d + D * m + p + P * m
+
+
+def css_estimate(
+    y: np.ndarray,
+    sarima_params: dict[str, tuple[int]],
+    exog: np.ndarray = None,
+    n_scored: int = None,
+):
+    """
+    Estimates a SARIMA model by minimizing the conditional sum of squares
+
+    The residuals of a parameter vector are one linear filter pass over the
+    differenced series, the first p + P*m residuals are conditioned on and left
+    out. The optimizer starts from Hannan-Rissanen regression estimates. This
+    takes a few milliseconds where the exact Kalman filter likelihood takes
+    seconds, the estimates rank candidate orders and seed the full MLE.
+
+    :param y: observed series
+    :param sarima_params: dict with "order" and "seasonal_order"
+    :param exog: optional regressors with one row per observation
+    :param n_scored: compute the AIC on the residuals of the last n_scored
+        observations only. Differencing and burn-in drop a different number of
+        days per order, with the same n_scored the AICs of orders with another
+        (d, D) or burn-in are computed on the same days and can be compared.
+    :return: SARIMAX ordered params (exog, ar, ma, seasonal ar, seasonal ma,
+        sigma2), the CSS based AIC and the number of residuals used
+    """
+    p, d, q = sarima_params["order"]
+    P, D, Q, m = sarima_params["seasonal_order"]
+    y = np.asarray(y, dtype=float)
+
+    n_exog = 0 if exog is None else exog.shape[1]
+    if n_exog:
+        exog = np.asarray(exog, dtype=float)
+        beta = np.linalg.lstsq(exog, y, rcond=None)[0]
+        # Differenzierte Regressoren, damit die Residuen linear in beta bleiben
+        exog_diff = difference(exog, d, D, m)
+    else:
+        beta = np.empty(0)
+    y_diff = difference(y, d, D, m)
+    burn_in = p + P * m
+
+    if len(y_diff) - burn_in <= p + q + P + Q + n_exog:
+        raise ValueError("Too few observations for the candidate order")
+
+    splits = np.cumsum([n_exog, p, q, P])
+    # Strafwert für Parameter, deren Filter explodiert
+    penalty = 1e10 * (1.0 + np.mean(y_diff**2))
+
+    def residuals(params):
+        beta, ar, ma, seasonal_ar, seasonal_ma = np.split(params, splits)
+        w = y_diff - exog_diff @ beta if n_exog else y_diff
+        ar_polynomial = lag_polynomial(ar, seasonal_ar, m, -1)
+        ma_polynomial = lag_polynomial(ma, seasonal_ma, m, 1)
+        return lfilter(ar_polynomial, ma_polynomial, w)[burn_in:]
+
+    def objective(params):
+        with np.errstate(over="ignore", invalid="ignore"):
+            ssr = np.sum(residuals(params) ** 2)
+        return ssr if np.isfinite(ssr) else penalty
+
+    w = y_diff - exog_diff @ beta if n_exog else y_diff
+    start = np.r_[beta, hannan_rissanen(w, p, q, P, Q, m)]
+    bounds = [(None, None)] * n_exog + [
+        (-COEFFICIENT_BOUND, COEFFICIENT_BOUND)
+    ] * (p + q + P + Q)
+    if len(start):
+        estimates = minimize(objective, start, method="L-BFGS-B", bounds=bounds).x
+    else:
+        estimates = start
+
+    n = len(y_diff) - burn_in
+    ssr = objective(estimates)
+    sigma2 = ssr / n
+    if n_scored is not None and n_scored < n:
+        with np.errstate(over="ignore", invalid="ignore"):
+            ssr = np.sum(residuals(estimates)[-n_scored:] ** 2)
+        n = n_scored
+    k = len(start) + 1
+    aic = n * np.log(ssr / n) + 2 * k if ssr > 0 else -np.inf
+
+    return np.r_[estimates, sigma2], float(aic), n
@@ -1,5 +1,6 @@
 import datetime
 
+import numpy as np
 import pandas as pd
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 
@@ -7,6 +8,34 @@ DEFAULT_PARAMS = {
     "order": (2, 0, 0),
     "seasonal_order": (1, 0, 2, 7),
 }
+# Rows appended by update() before the parameters are estimated again
+DEFAULT_REFIT_AFTER = 90
+# Period in days of the yearly seasonality modeled by Fourier terms
+YEARLY_PERIOD = 365.25
+FOURIER_ORIGIN = pd.Timestamp("1970-01-01")
+
+
+def fourier_terms(dates, periods: dict[float, int]) -> np.ndarray:
+    """
+    Builds sine and cosine regressors for long seasonal periods
+
+    The terms depend on the day number since FOURIER_ORIGIN only, so the columns
+    for training and forecast dates continue each other.
+
+    :param dates: dates to build the terms for
+    :param periods: number of harmonics per seasonal period in days, e.g.
+        {365.25: 4, 7: 2}
+    :return: array with shape (len(dates), 2 * sum of harmonics)
+    """
+    days = (pd.DatetimeIndex(dates) - FOURIER_ORIGIN).days.to_numpy(dtype=float)
+    frequencies = np.concatenate(
+        [
+            np.arange(1, harmonics + 1) / float(period)
+            for period, harmonics in periods.items()
+        ]
+    )
+    angles = 2 * np.pi * days[:, None] * frequencies[None, :]
+    return np.hstack([np.sin(angles), np.cos(angles)])
 
 
 class Sarima:
@@ -15,10 +44,23 @@ class Sarima:
         data: pd.DataFrame,
         target_days: int = 30,
         sarima_params: dict[str, tuple[int]] = DEFAULT_PARAMS,
+        start_params: np.ndarray | None = None,
+        refit_after: int = DEFAULT_REFIT_AFTER,
+        forecast_only: bool = False,
     ) -> None:
         self.data = data
         self.target_days = target_days
         self._sarima_params = sarima_params
+        # Startwerte für die MLE, z.B. die Schätzung des vorherigen Folds
+        self.start_params = start_params
+        self.fitted_params = None
+        self.fit_iterations = None
+        # Ergebnis des letzten Fits, update() hängt neue Tage daran an
+        self.results = None
+        self.refit_after = refit_after
+        self.rows_since_fit = 0
+        # Nur Prognosen: Skala konzentriert, keine Glättung und Diagnostik speichern
+        self.forecast_only = forecast_only
 
     @property
     def sarima_params(self) -> dict[str, tuple[int]]:
@@ -32,25 +74,71 @@ class Sarima:
             self._sarima_params = new_params
 
     def predict(self) -> pd.DataFrame:
-        train_data = self.data["occupancy"]
+        if self.results is None:
+            self.results = self._fit(self.data["occupancy"])
+            self.rows_since_fit = 0
+
+        return self._forecast()
+
+    def artifact(self) -> dict:
+        """
+        :return: the estimated params, the results are rebuilt from them by restore
+        """
+        return {"fitted_params": self.fitted_params}
+
+    def restore(self, artifact: dict) -> None:
+        """
+        Continues from stored estimates, only the Kalman filter runs over the data
+
+        :param artifact: as returned by artifact
+        """
+        self.fitted_params = artifact["fitted_params"]
+        self.results = self._model(self.data["occupancy"]).filter(
+            self.fitted_params, low_memory=self.forecast_only
+        )
+        self.rows_since_fit = 0
+
+    def update(self, new_rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        Appends new days to the fitted model and forecasts from the last of them
+
+        The new observations run through the Kalman filter with the estimated
+        parameters kept. Once more than refit_after rows were appended since the
+        last estimation, the parameters are estimated again on all data, warm
+        started from the previous estimates.
+
+        :param new_rows: Pandas DataFrame with date and occupancy of the days
+            following the data
+        :return: Pandas DataFrame with the forecast after the new days
+        """
+        self.data = pd.concat([self.data, new_rows], ignore_index=True)
+
+        if self.results is None:
+            return self.predict()
+
+        self.rows_since_fit += len(new_rows)
+        if self.rows_since_fit > self.refit_after:
+            self.start_params = self.fitted_params
+            self.results = None
+            return self.predict()
+
+        self.results = self.results.append(
+            new_rows["occupancy"].to_numpy(dtype=float),
+            exog=self._exog(new_rows["date"]),
+            refit=False,
+        )
+        return self._forecast()
+
+    def _forecast(self) -> pd.DataFrame:
         start_date = self.data["date"].iloc[-1] + datetime.timedelta(days=1)
 
         prediction_dates = [
             start_date + datetime.timedelta(days=i) for i in range(self.target_days)
         ]
 
-        order = self.sarima_params["order"]
-        seasonal_order = self.sarima_params["seasonal_order"]
-
-        model = SARIMAX(
-            train_data,
-            order=order,
-            seasonal_order=seasonal_order,
-        )
-
-        model_fit = model.fit(disp=False)
-
-        prediction = model_fit.forecast(steps=self.target_days).astype(int)
+        prediction = self.results.forecast(
+            steps=self.target_days, exog=self._exog(prediction_dates)
+        ).astype(int)
 
         return pd.DataFrame({"date": prediction_dates, "occupancy": prediction})
 
@@ -62,19 +150,64 @@ class Sarima:
             start_date + datetime.timedelta(days=i) for i in range(self.target_days)
         ]
 
-        order = self.sarima_params["order"]
-        seasonal_order = self.sarima_params["seasonal_order"]
+        model_fit = self._fit(train_data)
 
-        model = SARIMAX(
+        forecast_dates = pd.date_range(
+            self.data["date"].iloc[-1] + datetime.timedelta(days=1),
+            periods=self.target_days,
+            freq="D",
+        )
+        prediction = model_fit.forecast(
+            steps=self.target_days, exog=self._exog(forecast_dates)
+        )
+        return pd.DataFrame({"date": prediction_dates, "occupancy": prediction})
+
+    def _model(self, train_data: pd.Series) -> SARIMAX:
+        """
+        With forecast_only the variance is concentrated out of the likelihood, so
+        the optimizer searches one parameter less. Long seasonal periods given in
+        sarima_params["fourier"] enter as Fourier regressors, the seasonal order
+        then only has to cover the short seasonality.
+        """
+        return SARIMAX(
             train_data,
-            order=order,
-            seasonal_order=seasonal_order,
+            exog=self._exog(self.data.loc[train_data.index, "date"]),
+            order=self.sarima_params["order"],
+            seasonal_order=self.sarima_params["seasonal_order"],
+            concentrate_scale=self.forecast_only,
         )
 
-        model_fit = model.fit(disp=False)
+    def _exog(self, dates) -> np.ndarray | None:
+        periods = self.sarima_params.get("fourier")
+        if not periods:
+            return None
+        return fourier_terms(dates, periods)
 
-        prediction = model_fit.forecast(steps=self.target_days)
-        return pd.DataFrame({"date": prediction_dates, "occupancy": prediction})
+    def _fit(self, train_data: pd.Series):
+        """
+        Fits the SARIMAX model, warm started from start_params if they fit the order
+
+        With forecast_only the Kalman filter keeps only what forecasting needs,
+        the smoothed states, the covariance history and the residual diagnostics
+        are not stored.
+
+        :param train_data: occupancy to fit on
+        :return: the fitted SARIMAX results, the estimated params are kept in
+            fitted_params to warm start the next fit
+        """
+        model = self._model(train_data)
+
+        start_params = self.start_params
+        if start_params is not None and len(start_params) != model.k_params:
+            start_params = None
+
+        model_fit = model.fit(
+            start_params=start_params, disp=False, low_memory=self.forecast_only
+        )
+
+        self.fitted_params = np.asarray(model_fit.params)
+        self.fit_iterations = model_fit.mle_retvals.get("iterations")
+        return model_fit
 
     def _check_valid_param(self, param_name: str, nr_of_ints: int) -> bool:
         if (
@@ -1,11 +1,21 @@
 import os
 import sys
 import json
+import functools
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 from sklearn.metrics import root_mean_squared_error, mean_absolute_percentage_error, mean_absolute_error
 from sklearn.model_selection import TimeSeriesSplit
+from models.artifacts import ARTIFACT_VERSION, LIBRARY_VERSIONS, ArtifactStore
+from models.cache import ParamCache, ResultCache, fingerprint
 import models.random_forest.rf as rf
+import models.gradient_boosting.hgb as hgb
 import models.sarima.sarima as s
+import models.sarima.auto_order as auto_order
 import models.holt_winter.holt_winter as hw
 import pandas as pd
 import numpy as np
@@ -22,13 +32,34 @@ type_default = "forecast"
 input_folder_path = os.path.join(wrapper_dir, "..", "output")
 # relative path from input folder to input file
 input_file_path = ""
-prediction_days = 0
-type = ""
-advanced = False
-sarima_params = {}
-wh_params = {}
-wh_smoothing_params = {}
-rf_params = {}
+# Output of every ForecastJob, one folder per job id
+jobs_folder_path = os.path.join(output_folder_path, "jobs")
+# Job folders are removed after a day, only the newest ones are kept
+job_folder_max_age = 24 * 60 * 60
+job_folder_max_count = 64
+# Published files are replaced by one job at a time
+publish_lock = threading.Lock()
+# Tuned Holt-Winters smoothing params, keyed by data fingerprint and settings
+hw_param_cache = ParamCache(
+    os.path.join(output_folder_path, "cache", "holt_winter_params"),
+    max_entries=256,
+)
+# Candidate orders fitted by full MLE after the CSS prescreening
+sarima_top_k = 8
+# Selected SARIMA orders, keyed by data fingerprint and settings
+sarima_order_cache = ParamCache(
+    os.path.join(output_folder_path, "cache", "sarima_orders"),
+    max_entries=256,
+)
+# The wrapper only forecasts, so SARIMA skips storing smoother and diagnostics
+sarima_forecast_only = True
+# Fitted models, keyed by training data, params and library versions
+model_store = ArtifactStore(os.path.join(output_folder_path, "models"))
+# Predictions and metrics of finished jobs, keyed by data and every setting that
+# changes them, kept in memory and on disk for a day
+result_cache = ResultCache(
+    os.path.join(output_folder_path, "cache", "results"), max_entries=32
+)
 rf_default_params = {
     "n_estimators": 1,
     "criterion": "squared_error",
@@ -55,60 +86,463 @@ sarima_default_params = {
     "seasonal_order": (1, 0, 2, 7),
 }
 
-# Build models and conduct predictions
-def build_models_and_predict(
+# Replace an automatic SARIMA order request by the selected order, without
+# use_cache the order is selected again instead of taken from sarima_order_cache
+def resolve_sarima_params(train_data, sarima_params, n_jobs=1, use_cache=True):
+    if not sarima_params or not sarima_params.get("auto"):
+        return sarima_params
+
+    best_params, report = auto_order.select_order(
+        train_data,
+        criterion=sarima_params.get("criterion", "aic"),
+        candidates=auto_order.candidate_orders(m=sarima_params.get("m", 7)),
+        n_jobs=n_jobs,
+        cache=sarima_order_cache if use_cache else None,
+        top_k=sarima_params.get("top_k", sarima_top_k),
+    )
+    if report:
+        pruned = sum(not np.isfinite(score) for _, score in report)
+        print(
+            f"SARIMA order {best_params['order']}x{best_params['seasonal_order']} "
+            f"selected from {len(report)} candidates, "
+            f"{pruned} pruned or not shortlisted"
+        )
+    if sarima_params.get("fourier"):
+        best_params = dict(best_params, fourier=sarima_params["fourier"])
+    return best_params
+
+
+# Load a stored fit of the model or fit it and store it, without use_cache the
+# model store is neither read nor written
+def load_or_fit(
+    model_name, train_data, settings, build, mmap_mode=None, use_cache=True
+):
+    history = train_data[["date", "occupancy"]]
+    key = model_store.key(history, model_name, **settings)
+    artifact = model_store.load(model_name, key, mmap_mode) if use_cache else None
+
+    model = build(artifact)
+    if artifact is not None:
+        model.restore(artifact)
+    prediction = model.predict()
+
+    if artifact is None and use_cache:
+        model_store.save(model_name, key, model.artifact(), history, settings)
+    return model, prediction
+
+
+# Fit or load one model, run in this process or in a worker process of the
+# model pool, so it only uses its arguments and module level settings
+def fit_random_forest(train_data, prediction_days, rf_model_params, use_cache=True):
+    rf_model, prediction_rf = load_or_fit(
+        "random_forest",
+        train_data,
+        # n_jobs does not change the forest, so it is not part of the key
+        {
+            "rf_params": {
+                name: value
+                for name, value in rf_model_params.items()
+                if name != "n_jobs"
+            }
+        },
+        lambda artifact: rf.Rf(
+            train_data.copy(deep=True), prediction_days, rf_model_params
+        ),
+        # the flattened trees are mapped from the artifact, not read
+        mmap_mode="r",
+        use_cache=use_cache,
+    )
+    print(rf_model.timing_report())
+    return rf_model, prediction_rf
+
+
+def fit_gradient_boosting(train_data, prediction_days, hgb_params, use_cache=True):
+    hgb_model, prediction_hgb = load_or_fit(
+        "gradient_boosting",
+        train_data,
+        {"hgb_params": hgb_params},
+        lambda artifact: hgb.Hgb(train_data, prediction_days, hgb_params),
+        use_cache=use_cache,
+    )
+    print(hgb_model.timing_report())
+    return hgb_model, prediction_hgb
+
+
+def fit_holt_winter(
+    train_data,
+    prediction_days,
+    wh_params,
+    wh_smoothing_params,
+    hw_n_jobs,
+    hw_search,
+    hw_max_evaluations,
+    hw_search_space="baseline",
+    use_cache=True,
+):
+    hw_model, prediction_hw = load_or_fit(
+        "holt_winter",
+        train_data,
+        {
+            "prediction_days": prediction_days,
+            "params": wh_params,
+            "smoothing_params": wh_smoothing_params,
+            "search": hw_search,
+            "max_evaluations": hw_max_evaluations,
+            "search_space": hw_search_space,
+        },
+        lambda artifact: hw.holtwinters(
+            train_data,
+            prediction_days,
+            wh_params,
+            smoothing_params=(
+                artifact["smoothing_params"] if artifact else wh_smoothing_params
+            ),
+            n_jobs=hw_n_jobs,
+            search=hw_search,
+            max_evaluations=hw_max_evaluations,
+            # Ohne use_cache wird auch die Suche wiederholt
+            cache=hw_param_cache if use_cache else None,
+            search_space=hw_search_space,
+        ),
+        use_cache=use_cache,
+    )
+    if hw_model.search_evaluations:
+        print(hw_model.search_report())
+    return hw_model, prediction_hw
+
+
+def fit_sarima(
+    train_data,
+    prediction_days,
+    sarima_params,
+    sarima_start_params,
+    n_jobs,
+    use_cache=True,
+):
+    sarima_params = resolve_sarima_params(
+        train_data, sarima_params, n_jobs, use_cache
+    )
+    return load_or_fit(
+        "sarima",
+        train_data,
+        # the MLE can end elsewhere from other start values
+        {
+            "sarima_params": sarima_params,
+            "start_params": (
+                None
+                if sarima_start_params is None
+                else np.asarray(sarima_start_params).tolist()
+            ),
+            "forecast_only": sarima_forecast_only,
+        },
+        lambda artifact: s.Sarima(
+            train_data,
+            prediction_days,
+            sarima_params,
+            start_params=sarima_start_params,
+            forecast_only=sarima_forecast_only,
+        ),
+        use_cache=use_cache,
+    )
+
+
+# Run the model fits one after another or on a pool of worker processes
+def run_model_fits(fits, workers=1, follow_ups=None):
+    """
+    :param fits: dict of name to (fit function, keyword arguments)
+    :param workers: number of worker processes, 1 fits in this process
+    :param follow_ups: optional dict of the name of a fit to a function, which
+        takes the (model, prediction) of this fit and returns the name and
+        (fit function, keyword arguments) of a fit depending on it, scheduled as
+        soon as the result is there
+    :return: dict of name to (model, prediction); a failed model gets
+        (None, None) and the others are still collected, only if every model
+        failed the first error is raised
+    """
+    follow_ups = follow_ups or {}
+    results = {}
+    errors = []
+    if workers <= 1 or len(fits) + len(follow_ups) <= 1:
+        pending = list(fits.items())
+        while pending:
+            name, (fit, kwargs) = pending.pop(0)
+            try:
+                results[name] = fit(**kwargs)
+            except Exception as error:
+                print(f"{name} failed: {error!r}")
+                errors.append(error)
+                results[name] = (None, None)
+            if name in follow_ups:
+                pending.append(follow_ups[name](results[name]))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(fits) + len(follow_ups))
+        ) as executor:
+            futures = {
+                executor.submit(fit, **kwargs): name
+                for name, (fit, kwargs) in fits.items()
+            }
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as error:
+                        print(f"{name} failed: {error!r}")
+                        errors.append(error)
+                        results[name] = (None, None)
+                    if name in follow_ups:
+                        follow_up, (fit, kwargs) = follow_ups[name](results[name])
+                        futures[executor.submit(fit, **kwargs)] = follow_up
+
+    if errors and len(errors) == len(results):
+        raise errors[0]
+    return results
+
+
+# Collect the fits of the selected models
+def model_fits(
     train_data,
     prediction_days,
     wh_params,
     wh_smoothing_params,
     rf_params,
     sarima_params,
+    hw_n_jobs=1,
+    hw_search="grid",
+    hw_max_evaluations=None,
+    sarima_start_params=None,
+    sarima_auto=False,
+    rf_n_jobs=None,
+    hgb_params=None,
+    advanced=False,
+    hw_search_space="baseline",
+    use_cache=True,
+    sarima_n_jobs=1,
 ):
     # Test whether advanced parameters have been set or not
     if not advanced:
-        rf_model = rf.Rf(train_data.copy(deep=True), prediction_days, {})
-        hw_model = hw.holtwinters(train_data, prediction_days)
-        sarima_model = s.Sarima(train_data, prediction_days)
+        wh_params = None
+        wh_smoothing_params = None
+        rf_params = {}
+        hgb_params = {}
+        sarima_params = {"auto": True} if sarima_auto else s.DEFAULT_PARAMS
 
-        prediction_rf = "Random-Forest", rf_model.predict()
-        prediction_hw = "Holt-Winter", hw_model.predict()
-        prediction_sarima = "Sarima", sarima_model.predict()
+    # If advanced, only the models with parameters are fitted, Gradient-Boosting
+    # only ever runs with its parameters
+    fits = {}
+    if not advanced or rf_params:
+        rf_model_params = dict(rf_params)
+        if rf_n_jobs is not None:
+            rf_model_params["n_jobs"] = rf_n_jobs
+        fits["Random-Forest"] = (
+            fit_random_forest,
+            {
+                "train_data": train_data,
+                "prediction_days": prediction_days,
+                "rf_model_params": rf_model_params,
+                "use_cache": use_cache,
+            },
+        )
 
-    # If True use the advanced parameters to fit and calculate the output.
-    else:
-        rf_model = (
-            rf.Rf(train_data.copy(deep=True), prediction_days, {})
-            if rf_params
-            else None
+    if hgb_params:
+        fits["Gradient-Boosting"] = (
+            fit_gradient_boosting,
+            {
+                "train_data": train_data,
+                "prediction_days": prediction_days,
+                "hgb_params": hgb_params,
+                "use_cache": use_cache,
+            },
         )
-        hw_model = (
-            hw.holtwinters(
-                train_data,
-                prediction_days,
-                wh_params,
-                smoothing_params=wh_smoothing_params,
-            )
-            if wh_params
-            else None
+
+    if not advanced or wh_params:
+        fits["Holt-Winter"] = (
+            fit_holt_winter,
+            {
+                "train_data": train_data,
+                "prediction_days": prediction_days,
+                "wh_params": wh_params,
+                "wh_smoothing_params": wh_smoothing_params,
+                "hw_n_jobs": hw_n_jobs,
+                "hw_search": hw_search,
+                "hw_max_evaluations": hw_max_evaluations,
+                "hw_search_space": hw_search_space,
+                "use_cache": use_cache,
+            },
         )
-        sarima_model = (
-            s.Sarima(train_data, prediction_days, sarima_params)
-            if sarima_params
-            else None
+
+    if not advanced or sarima_params:
+        fits["Sarima"] = (
+            fit_sarima,
+            {
+                "train_data": train_data,
+                "prediction_days": prediction_days,
+                "sarima_params": sarima_params,
+                "sarima_start_params": sarima_start_params,
+                "n_jobs": sarima_n_jobs,
+                "use_cache": use_cache,
+            },
         )
 
-        prediction_rf = "Random-Forest", rf_model.predict() if rf_model else None
-        prediction_hw = "Holt-Winter", hw_model.predict() if hw_model else None
-        prediction_sarima = "Sarima", sarima_model.predict() if sarima_model else None
+    return fits
+
+
+# Every model the wrapper can fit, in the order of the metrics
+model_names = ("Random-Forest", "Holt-Winter", "Sarima", "Gradient-Boosting")
+
+
+# (name, prediction) of every model in the results, as calculate_metrics takes them
+def named_predictions(results, suffix=""):
+    return [
+        (name, results.get(name + suffix, (None, None))[1]) for name in model_names
+    ]
+
+
+# Models and predictions in the order build_models_and_predict returns them,
+# Gradient-Boosting is only in the results of run_model_fits
+def model_results(results, suffix=""):
+    rf_model, prediction_rf = results.get("Random-Forest" + suffix, (None, None))
+    hw_model, prediction_hw = results.get("Holt-Winter" + suffix, (None, None))
+    sarima_model, prediction_sarima = results.get("Sarima" + suffix, (None, None))
 
     return (
         rf_model,
         hw_model,
         sarima_model,
-        prediction_rf,
-        prediction_hw,
-        prediction_sarima,
+        ("Random-Forest", prediction_rf),
+        ("Holt-Winter", prediction_hw),
+        ("Sarima", prediction_sarima),
+    )
+
+
+# Build models and conduct predictions
+def build_models_and_predict(
+    train_data,
+    prediction_days,
+    wh_params,
+    wh_smoothing_params,
+    rf_params,
+    sarima_params,
+    hw_n_jobs=1,
+    hw_search="grid",
+    hw_max_evaluations=None,
+    sarima_start_params=None,
+    sarima_auto=False,
+    rf_n_jobs=None,
+    hgb_params=None,
+    advanced=False,
+    hw_search_space="baseline",
+    use_cache=True,
+    sarima_n_jobs=1,
+    workers=1,
+):
+    fits = model_fits(
+        train_data,
+        prediction_days,
+        wh_params,
+        wh_smoothing_params,
+        rf_params,
+        sarima_params,
+        hw_n_jobs,
+        hw_search,
+        hw_max_evaluations,
+        sarima_start_params,
+        sarima_auto,
+        rf_n_jobs,
+        hgb_params,
+        advanced,
+        hw_search_space,
+        use_cache,
+        sarima_n_jobs,
     )
+    return model_results(run_model_fits(fits, workers))
+
+
+# Let a forecast fit start from what the holdout fit of the model tuned
+def reuse_holdout_fit(name, fit, holdout_result):
+    fit_function, kwargs = fit
+    holdout_model = holdout_result[0]
+    if holdout_model is None:
+        return name, fit
+
+    if name == "Holt-Winter" and holdout_model.smoothing_params:
+        # The grid search does not run a second time
+        kwargs = dict(kwargs, wh_smoothing_params=holdout_model.smoothing_params)
+    elif name == "Sarima":
+        # The order is selected once, the MLE starts from the holdout estimates
+        kwargs = dict(
+            kwargs,
+            sarima_params=holdout_model.sarima_params,
+            sarima_start_params=holdout_model.fitted_params,
+        )
+    return name, (fit_function, kwargs)
+
+
+# Fit the models on setup_test's train split for the metrics and on all data for
+# the forecast in one schedule
+def forecast_and_evaluate(
+    df,
+    prediction_days,
+    wh_params,
+    wh_smoothing_params,
+    rf_params,
+    sarima_params,
+    hw_n_jobs=1,
+    hw_search="grid",
+    hw_max_evaluations=None,
+    sarima_auto=False,
+    rf_n_jobs=None,
+    hgb_params=None,
+    advanced=False,
+    hw_search_space="baseline",
+    use_cache=True,
+    sarima_n_jobs=1,
+    workers=1,
+):
+    """
+    Random Forest and Gradient Boosting tune nothing, their forecast fits run
+    right away next to the holdout fits. The Holt-Winters and SARIMA forecast
+    fits are scheduled once their holdout fit finished: Holt-Winters takes its
+    smoothing params instead of searching again, SARIMA the selected order and
+    the estimates as start values.
+
+    :return: the results of run_model_fits, the holdout fits named
+        "<model> (holdout)", and the test data of the holdout
+    """
+    test_data, train_data = setup_test(df, prediction_days)
+    settings = (
+        wh_params,
+        wh_smoothing_params,
+        rf_params,
+        sarima_params,
+        hw_n_jobs,
+        hw_search,
+        hw_max_evaluations,
+        None,
+        sarima_auto,
+        rf_n_jobs,
+        hgb_params,
+        advanced,
+        hw_search_space,
+        use_cache,
+        sarima_n_jobs,
+    )
+    holdout_fits = model_fits(train_data, prediction_days, *settings)
+    forecast_fits = model_fits(df, prediction_days, *settings)
+
+    fits = {f"{name} (holdout)": fit for name, fit in holdout_fits.items()}
+    follow_ups = {}
+    for name, fit in forecast_fits.items():
+        if name in ("Holt-Winter", "Sarima"):
+            follow_ups[f"{name} (holdout)"] = functools.partial(
+                reuse_holdout_fit, name, fit
+            )
+        else:
+            fits[name] = fit
+
+    return run_model_fits(fits, workers, follow_ups), test_data
 
 
 # Calculate Error metrics if selected:
@@ -137,18 +571,61 @@ def calculate_metrics(test_data, *predictions):
 
 
 # Execute basic test if selected
-def setup_test(setup_test_data):
+def setup_test(setup_test_data, prediction_days):
     split_day = setup_test_data["date"].max() - pd.DateOffset(days=prediction_days)
     test_data = setup_test_data[setup_test_data["date"] > split_day]
     train_data = setup_test_data[setup_test_data["date"] <= split_day]
     return test_data, train_data
 
 
-# Execute advanced test (timeseries_split) if selected
-# Predictiondays über geben und als test size
-def setup_and_calculate_accurate(setup_accurate_data, prediction_days):
+# Let the SARIMA fit of a fold start from the estimates of the previous fold
+def warm_start_sarima(name, fit, previous_result):
+    fit_function, kwargs = fit
+    previous_model = previous_result[0]
+    if previous_model is None:
+        return name, fit
+    return name, (
+        fit_function,
+        dict(kwargs, sarima_start_params=previous_model.fitted_params),
+    )
+
+
+# Fit every (fold, model) pair of the accurate test and average the metrics
+def accurate_fold_results(
+    setup_accurate_data,
+    prediction_days,
+    wh_params,
+    wh_smoothing_params,
+    rf_params,
+    sarima_params,
+    hw_n_jobs=1,
+    hw_search="grid",
+    hw_max_evaluations=None,
+    sarima_auto=False,
+    rf_n_jobs=None,
+    hgb_params=None,
+    advanced=False,
+    hw_search_space="baseline",
+    use_cache=True,
+    sarima_n_jobs=1,
+    n_splits=3,
+    workers=1,
+):
+    """
+    Every (fold, model) pair is one fit for run_model_fits, with workers they run
+    on the process pool at the same time and the metrics are reduced per model
+    afterwards. The folds only grow by prediction_days rows, so every SARIMA fit
+    is started from the estimates of the previous fold. The SARIMA folds are
+    therefore fitted in turn with any number of workers, which keeps the result
+    independent of workers.
+
+    :param n_splits: number of TimeSeriesSplit folds
+    :param workers: number of worker processes, 1 fits in this process
+    :return: the run_model_fits results of the last fold, named like the
+        models, and the metrics averaged over the folds
+    """
     # Initialize TimeSeriesSplit
-    tscv = TimeSeriesSplit(n_splits=3, test_size=prediction_days)
+    tscv = TimeSeriesSplit(n_splits=n_splits, test_size=prediction_days)
 
     rmse_per_model = {}
     mape_per_model = {}
@@ -159,35 +636,50 @@ def setup_and_calculate_accurate(setup_accurate_data, prediction_days):
     average_mae_per_model = {}
     formatted_metrics = {}
 
+    fits = {}
+    follow_ups = {}
+    test_folds = []
     # Split data using Time Series Split
-    for train_index, test_index in tscv.split(setup_accurate_data):
-        train_data, test_data = (
-            setup_accurate_data.iloc[train_index],
-            setup_accurate_data.iloc[test_index],
-        )
-
+    for fold, (train_index, test_index) in enumerate(
+        tscv.split(setup_accurate_data), start=1
+    ):
         # Ensure modification doesn't affect the original data
-        train_data = train_data.copy()
+        train_data = setup_accurate_data.iloc[train_index].copy()
+        test_data = setup_accurate_data.iloc[test_index].copy()
+        test_folds.append(test_data)
 
-        # Ensure modification doesn't affect the original data
-        test_data = test_data.copy()
-        (
-            rf_model,
-            hw_model,
-            sarima_model,
-            prediction_rf,
-            prediction_hw,
-            prediction_sarima,
-        ) = build_models_and_predict(
+        for name, fit in model_fits(
             train_data,
             prediction_days,
             wh_params,
             wh_smoothing_params,
             rf_params,
             sarima_params,
-        )
+            hw_n_jobs,
+            hw_search,
+            hw_max_evaluations,
+            None,
+            sarima_auto,
+            rf_n_jobs,
+            hgb_params,
+            advanced,
+            hw_search_space,
+            use_cache,
+            sarima_n_jobs,
+        ).items():
+            key = f"{name} (fold {fold})"
+            if name == "Sarima" and fold > 1:
+                follow_ups[f"Sarima (fold {fold - 1})"] = functools.partial(
+                    warm_start_sarima, key, fit
+                )
+            else:
+                fits[key] = fit
+
+    results = run_model_fits(fits, workers, follow_ups)
+
+    for fold, test_data in enumerate(test_folds, start=1):
         metrics = calculate_metrics(
-            test_data, prediction_rf, prediction_hw, prediction_sarima
+            test_data, *named_predictions(results, f" (fold {fold})")
         )
 
         # Iterate over models in metrics
@@ -221,15 +713,25 @@ def setup_and_calculate_accurate(setup_accurate_data, prediction_days):
             "MAE" : average_mae_per_model[model_name],
         }
 
-    return (
-        rf_model,
-        hw_model,
-        sarima_model,
-        prediction_rf,
-        prediction_hw,
-        prediction_sarima,
-        formatted_metrics,
-    )
+    last_fold = f" (fold {len(test_folds)})"
+    last_results = {
+        name: results[name + last_fold]
+        for name in model_names
+        if name + last_fold in results
+    }
+    return last_results, formatted_metrics
+
+
+# Execute advanced test (timeseries_split) if selected
+# Predictiondays über geben und als test size
+def setup_and_calculate_accurate(*args, **kwargs):
+    """
+    Takes the parameters of accurate_fold_results
+    :return: models and predictions of the last fold and the metrics averaged
+        over the folds
+    """
+    last_results, formatted_metrics = accurate_fold_results(*args, **kwargs)
+    return (*model_results(last_results), formatted_metrics)
 
 
 # Remove old predictions
@@ -239,41 +741,344 @@ def remove_files_if_exist(*file_paths):
             os.remove(file_path)
 
 
+# File names of the predictions in an output folder
+output_file_names = {
+    "Random-Forest": "latest_random_forest.csv",
+    "Holt-Winter": "latest_holt_winter.csv",
+    "Sarima": "latest_sarima.csv",
+    "Gradient-Boosting": "latest_gradient_boosting.csv",
+}
+
+
+# Remove the job folders older than max_age seconds and all but the max_jobs
+# most recently written or read ones, the folder keep is never removed
+def clean_job_folders(
+    jobs_folder=jobs_folder_path,
+    max_age=job_folder_max_age,
+    max_jobs=job_folder_max_count,
+    keep=None,
+):
+    try:
+        entries = list(os.scandir(jobs_folder))
+    except FileNotFoundError:
+        return
+
+    folders = []
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                folders.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            continue
+
+    now = time.time()
+    folders.sort(reverse=True)
+    for index, (last_used, path) in enumerate(folders):
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        if index >= max_jobs or now - last_used > max_age:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# Write the csv next to its final path first, so readers never see half a file
+def write_csv(frame, file_path):
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, file_path)
+
+
 # Write output
-def write_output(prediction_sarima=None, prediction_hw=None, prediction_rf=None):
-    remove_files_if_exist(
-        os.path.join(output_folder_path, "latest_random_forest.csv"),
-        os.path.join(output_folder_path, "latest_holt_winter.csv"),
-        os.path.join(output_folder_path, "latest_sarima.csv"),
-    )
+def write_output(
+    prediction_sarima=None,
+    prediction_hw=None,
+    prediction_rf=None,
+    prediction_hgb=None,
+    output_folder=output_folder_path,
+):
+    os.makedirs(output_folder, exist_ok=True)
+    for prediction in (prediction_rf, prediction_hw, prediction_sarima, prediction_hgb):
+        if prediction is None:
+            continue
+        model_name, prediction_data = prediction
+        file_path = os.path.join(output_folder, output_file_names[model_name])
+        if prediction_data is not None and not prediction_data.empty:
+            write_csv(prediction_data, file_path)
+        else:
+            remove_files_if_exist(file_path)
+    print("Success: New model output generated")
+
+
+class ForecastJob:
+    """
+    One run of the wrapper with all of its parameters
 
-    if (
-        prediction_rf is not None
-        and prediction_rf[1] is not None
-        and not prediction_rf[1].empty
+    A job only reads its own attributes and writes its predictions into its own
+    output folder, so jobs can run from many threads at the same time. publish
+    copies the predictions of a finished job to the files the dashboard reads.
+
+    :param data: DataFrame with date and occupancy
+    :param prediction_days: days to forecast, or held out by test and accurate
+    :param type: "forecast", "test" or "accurate"
+    :param sarima_params: see call_wrapper, like the other model params they are
+        only used with advanced
+    :param advanced: fit only the models with params, with their params
+    :param n_jobs: worker processes of the Holt-Winters search
+    :param search: Holt-Winters search strategy
+    :param max_evaluations: candidates of the random Holt-Winters strategies
+    :param search_space: Holt-Winters smoothing grid, "baseline" or "full"
+    :param sarima_auto: select the SARIMA order without advanced params
+    :param sarima_n_jobs: worker processes of the SARIMA order selection, None
+        takes n_jobs
+    :param rf_n_jobs: Random Forest threads, None keeps rf_params
+    :param workers: worker processes the models are fitted on at the same time
+    :param n_splits: TimeSeriesSplit folds of the accurate test
+    :param output_folder: folder of the predictions, default jobs/<job_id>, which
+        clean_job_folders removes after job_folder_max_age seconds or once
+        job_folder_max_count other jobs were used more recently. Readers touch
+        the folder to mark it as used.
+    :param job_id: name of the job, default a random hex id
+    :param use_cache: return the predictions and metrics of an earlier job with
+        the same data and settings from result_cache instead of fitting again,
+        False also fits every model again instead of loading it from model_store
+        and searches the Holt-Winters smoothing params and SARIMA orders again
+        instead of taking them from hw_param_cache and sarima_order_cache
+    """
+
+    def __init__(
+        self,
+        data,
+        prediction_days=prediction_days_default,
+        type=type_default,
+        sarima_params=None,
+        wh_params=None,
+        wh_smoothing_params=None,
+        rf_params=None,
+        hgb_params=None,
+        advanced=False,
+        n_jobs=1,
+        search="grid",
+        max_evaluations=None,
+        search_space="baseline",
+        sarima_auto=False,
+        rf_n_jobs=None,
+        workers=1,
+        n_splits=3,
+        output_folder=None,
+        job_id=None,
+        use_cache=True,
+        sarima_n_jobs=None,
     ):
-        prediction_rf[1].to_csv(
-            os.path.join(output_folder_path, "latest_random_forest.csv"), index=False
+        self.data = data
+        self.prediction_days = prediction_days
+        self.type = type
+        self.sarima_params = sarima_params
+        self.wh_params = wh_params
+        self.wh_smoothing_params = wh_smoothing_params
+        self.rf_params = rf_params
+        self.hgb_params = hgb_params if hgb_params is not None else {}
+        self.advanced = advanced
+        self.n_jobs = n_jobs
+        self.search = search
+        self.max_evaluations = max_evaluations
+        self.search_space = search_space
+        self.sarima_auto = sarima_auto
+        self.sarima_n_jobs = n_jobs if sarima_n_jobs is None else sarima_n_jobs
+        self.rf_n_jobs = rf_n_jobs
+        self.workers = workers
+        self.n_splits = n_splits
+        self.job_id = job_id or uuid.uuid4().hex
+        self.output_folder = output_folder or os.path.join(
+            jobs_folder_path, self.job_id
         )
+        self.use_cache = use_cache
+        # Set by run, models stays empty if the result came from result_cache
+        self.models = {}
+        self.predictions = {}
+        self.metrics = None
 
-    if (
-        prediction_hw is not None
-        and prediction_hw[1] is not None
-        and not prediction_hw[1].empty
-    ):
-        prediction_hw[1].to_csv(
-            os.path.join(output_folder_path, "latest_holt_winter.csv"), index=False
+    @classmethod
+    def from_params(cls, params, **options):
+        """
+        Creates the job of the positional parameter list of call_wrapper
+        :param params: [data] or [data, days, type] or additionally sarima_params,
+            wh_params, wh_smoothing_params, rf_params and optionally hgb_params
+        :param options: keyword parameters of ForecastJob
+        """
+        match len(params):
+            # No default parameters and forecast
+            case 1:
+                return cls(params[0], **options)
+
+            # No advanced parameters are transferred
+            case 3:
+                return cls(params[0], params[1], params[2], **options)
+
+            # Advanced parameters, optionally including the Gradient-Boosting model
+            case 7 | 8:
+                return cls(*params, advanced=True, **options)
+
+            case _:
+                raise ValueError("Invalid parameter length")
+
+    def settings(self):
+        """
+        :return: the keyword parameters shared by the fit schedules
+        """
+        return {
+            "wh_params": self.wh_params,
+            "wh_smoothing_params": self.wh_smoothing_params,
+            "rf_params": self.rf_params,
+            "sarima_params": self.sarima_params,
+            "hw_n_jobs": self.n_jobs,
+            "hw_search": self.search,
+            "hw_max_evaluations": self.max_evaluations,
+            "hw_search_space": self.search_space,
+            "sarima_auto": self.sarima_auto,
+            "rf_n_jobs": self.rf_n_jobs,
+            "sarima_n_jobs": self.sarima_n_jobs,
+            "hgb_params": self.hgb_params,
+            "advanced": self.advanced,
+        }
+
+    def cache_key(self):
+        """
+        :return: key of the result in result_cache. The worker and thread counts
+            are left out, every schedule fits the same models with the same
+            start values, e.g. the SARIMA folds are always warm started in turn.
+        """
+        return fingerprint(
+            self.data[["date", "occupancy"]],
+            prediction_days=self.prediction_days,
+            type=self.type,
+            n_splits=self.n_splits,
+            version=ARTIFACT_VERSION,
+            libraries=LIBRARY_VERSIONS,
+            **{
+                name: value
+                for name, value in self.settings().items()
+                if name not in ("hw_n_jobs", "rf_n_jobs", "sarima_n_jobs")
+            },
         )
 
-    if (
-        prediction_sarima is not None
-        and prediction_sarima[1] is not None
-        and not prediction_sarima[1].empty
-    ):
-        prediction_sarima[1].to_csv(
-            os.path.join(output_folder_path, "latest_sarima.csv"), index=False
+    def run(self):
+        """
+        Fits the models, writes their predictions into output_folder
+        :return: metrics per model
+        """
+        if self.use_cache:
+            start = time.perf_counter()
+            key = self.cache_key()
+            cached = result_cache.get(key)
+            if cached is not None:
+                self.predictions = cached["predictions"]
+                self.metrics = cached["metrics"]
+                self.write_output()
+                print(
+                    f"Result loaded from cache in "
+                    f"{(time.perf_counter() - start) * 1000:.1f} ms"
+                )
+                print(self.metrics)
+                return self.metrics
+
+        match self.type:
+            case "forecast":
+                results, test_data = forecast_and_evaluate(
+                    self.data,
+                    self.prediction_days,
+                    workers=self.workers,
+                    use_cache=self.use_cache,
+                    **self.settings(),
+                )
+                metrics = calculate_metrics(
+                    test_data, *named_predictions(results, " (holdout)")
+                )
+
+            case "test":
+                test_data, train_data = setup_test(self.data, self.prediction_days)
+                results = run_model_fits(
+                    model_fits(
+                        train_data,
+                        self.prediction_days,
+                        use_cache=self.use_cache,
+                        **self.settings(),
+                    ),
+                    self.workers,
+                )
+                metrics = calculate_metrics(test_data, *named_predictions(results))
+
+            case "accurate":
+                results, metrics = accurate_fold_results(
+                    self.data,
+                    self.prediction_days,
+                    n_splits=self.n_splits,
+                    workers=self.workers,
+                    use_cache=self.use_cache,
+                    **self.settings(),
+                )
+
+            case _:
+                raise ValueError("Invalid type")
+
+        self.models = {
+            name: results.get(name, (None, None))[0] for name in model_names
+        }
+        self.predictions = dict(named_predictions(results))
+        self.metrics = metrics
+        if self.use_cache:
+            result_cache.put(
+                key, {"predictions": self.predictions, "metrics": self.metrics}
+            )
+
+        self.write_output()
+        print(metrics)
+        return metrics
+
+    def write_output(self):
+        """
+        Writes the predictions and the history into output_folder and removes
+        old job folders
+        """
+        write_output(
+            prediction_sarima=("Sarima", self.predictions.get("Sarima")),
+            prediction_hw=("Holt-Winter", self.predictions.get("Holt-Winter")),
+            prediction_rf=("Random-Forest", self.predictions.get("Random-Forest")),
+            prediction_hgb=(
+                "Gradient-Boosting",
+                self.predictions.get("Gradient-Boosting"),
+            ),
+            output_folder=self.output_folder,
         )
-    print("Success: New model output generated")
+        write_csv(
+            self.data[["date", "occupancy"]],
+            os.path.join(self.output_folder, "latest_history.csv"),
+        )
+        clean_job_folders(keep=self.output_folder)
+
+    def output_path(self, model_name):
+        """
+        :param model_name: e.g. "Random-Forest"
+        :return: path of the prediction of the model in output_folder
+        """
+        return os.path.join(self.output_folder, output_file_names[model_name])
+
+    def publish(self, output_folder=output_folder_path):
+        """
+        Replaces the latest_*.csv files and latest_history.csv in output_folder by
+        the ones of this job, one job at a time so the files always belong together
+        """
+        with publish_lock:
+            os.makedirs(output_folder, exist_ok=True)
+            write_csv(
+                self.data[["date", "occupancy"]],
+                os.path.join(output_folder, "latest_history.csv"),
+            )
+            for model_name, file_name in output_file_names.items():
+                prediction = self.predictions.get(model_name)
+                file_path = os.path.join(output_folder, file_name)
+                if prediction is not None and not prediction.empty:
+                    write_csv(prediction, file_path)
+                else:
+                    remove_files_if_exist(file_path)
 
 
 """
@@ -284,151 +1089,81 @@ def write_output(prediction_sarima=None, prediction_hw=None, prediction_rf=None)
     sarima_params (optional),
     wh_params(optional),
     wh_smoothing_params(optional),
-    rf_params(optional)
-"""
+    rf_params(optional),
+    hgb_params(optional, HistGradientBoostingRegressor params of the
+    Gradient-Boosting model, which only runs with advanced parameters if they
+    are transferred)
 
+    n_jobs (keyword) sets the number of worker processes for the Holt-Winters
+    smoothing parameter search (default: 1, no process pool).
+    search (keyword) selects the Holt-Winters search strategy: "grid" (default),
+    "coarse_to_fine", "random" or "latin_hypercube".
+    max_evaluations (keyword) caps the candidates of the random strategies.
+    search_space (keyword) selects the Holt-Winters smoothing grid: "baseline"
+    (default) keeps the candidates the original grid search tried, trend and
+    seasonal smoothing only at the lowest level, "full" searches every level x
+    trend x seasonal combination the pre-tests allow.
+    sarima_auto (keyword) selects the SARIMA order by AIC instead of using the
+    default order when no advanced parameters are transferred. Advanced
+    sarima_params request it with {"auto": True, "criterion": "aic" or "holdout",
+    "m": seasonal period, "top_k": candidates fitted after the CSS prescreen,
+    None fits all}. The prescreen ranks by AIC, so with "holdout" a larger
+    "top_k" finds the best holdout order more reliably.
+    sarima_n_jobs (keyword) sets the number of worker processes the SARIMA
+    candidate orders are fitted on (default: None, n_jobs like the Holt-Winters
+    search).
+    sarima_params may add "fourier": {period in days: harmonics}, e.g.
+    {365.25: 4}, to model long seasonal periods with Fourier regressors.
+    rf_n_jobs (keyword) sets the threads the Random Forest trains and predicts
+    with, it overrides n_jobs of rf_params (default: None, keep rf_params).
+    workers (keyword) sets the number of worker processes the selected models
+    are fitted on at the same time (default: 1, one after another). A model that
+    fails is left out and reported, the others are kept.
+    n_splits (keyword) sets the number of TimeSeriesSplit folds of the accurate
+    test (default: 3). With workers all folds are fitted at the same time, the
+    SARIMA folds one after another, each starting from the previous estimates.
+    use_cache (keyword) returns the predictions and metrics of an earlier call
+    with the same data and settings from result_cache, in memory or on disk for a
+    day (default: True). The stored models are not part of the cached result,
+    with False they are neither loaded from nor saved to the model store, and
+    the Holt-Winters smoothing params and SARIMA orders are searched again
+    without reading or writing their caches.
 
-def call_wrapper(params):
-    global output_folder_path
-    global input_folder_path
-    global input_file_path
-    global prediction_days
-    global type
-    global advanced
-    global sarima_params
-    global wh_params
-    global wh_smoothing_params
-    global rf_params
-
-    match len(params):
-        case 1:
-            # No default parameters and forecast
-            advanced = False
-            df = params[0]
-            prediction_days = prediction_days_default
-            type = type_default
-            sarima_params = None
-            wh_params = None
-            wh_smoothing_params = None
-            rf_params = None
-
-        # No advanced parameters are transferred
-        case 3:
-            advanced = False
-            df = params[0]
-            prediction_days = params[1]
-            type = params[2]
-
-        # Advanced parameters are transferred
-        case 7:
-            df = params[0]
-            prediction_days = params[1]
-            type = params[2]
-            advanced = True
-            sarima_params = params[3]
-            wh_params = params[4]
-            wh_smoothing_params = params[5]
-            rf_params = params[6]
-        case _:
-            raise ValueError("Invalid parameter length")
-
-    # Create relative path from input_folder to input_file
-    # input_file_path = os.path.join(input_folder_path, input_file)
-
-    # Test which type of output is to be generated
-    match type:
-        case "forecast":
-            (
-                rf_model,
-                hw_model,
-                sarima_model,
-                prediction_rf,
-                prediction_hw,
-                prediction_sarima,
-            ) = build_models_and_predict(
-                df,
-                prediction_days,
-                wh_params,
-                wh_smoothing_params,
-                rf_params,
-                sarima_params,
-            )
-            write_output(
-                prediction_sarima=prediction_sarima,
-                prediction_hw=prediction_hw,
-                prediction_rf=prediction_rf,
-            )
+    call_wrapper writes into the output folder itself. Callers running several
+    predictions at the same time, like the GUI sessions, use ForecastJob, which
+    takes the same parameters and writes into a folder per job.
+"""
 
-            test_data, train_data = setup_test(df)
-            (
-                rf_model,
-                hw_model,
-                sarima_model,
-                prediction_rf,
-                prediction_hw,
-                prediction_sarima,
-            ) = build_models_and_predict(
-                train_data,
-                prediction_days,
-                wh_params,
-                wh_smoothing_params,
-                rf_params,
-                sarima_params,
-            )
-            metrics = calculate_metrics(
-                test_data, prediction_rf, prediction_hw, prediction_sarima
-            )
-            print(metrics)
-            return metrics
-
-        case "test":
-            test_data, train_data = setup_test(df)
-            (
-                rf_model,
-                hw_model,
-                sarima_model,
-                prediction_rf,
-                prediction_hw,
-                prediction_sarima,
-            ) = build_models_and_predict(
-                train_data,
-                prediction_days,
-                wh_params,
-                wh_smoothing_params,
-                rf_params,
-                sarima_params,
-            )
-            metrics = calculate_metrics(
-                test_data, prediction_rf, prediction_hw, prediction_sarima
-            )
-            write_output(
-                prediction_sarima=prediction_sarima,
-                prediction_hw=prediction_hw,
-                prediction_rf=prediction_rf,
-            )
-            print(metrics)
-            return metrics
-
-        case "accurate":
-            (
-                rf_model,
-                hw_model,
-                sarima_model,
-                prediction_rf,
-                prediction_hw,
-                prediction_sarima,
-                formatted_metrics,
-            ) = setup_and_calculate_accurate(df, prediction_days)
-            print(formatted_metrics)
-            write_output(
-                prediction_sarima=prediction_sarima,
-                prediction_hw=prediction_hw,
-                prediction_rf=prediction_rf,
-            )
-            return formatted_metrics
 
-        case _:
-            raise ValueError("Invalid type")
+def call_wrapper(
+    params,
+    n_jobs=1,
+    search="grid",
+    max_evaluations=None,
+    sarima_auto=False,
+    rf_n_jobs=None,
+    workers=1,
+    n_splits=3,
+    use_cache=True,
+    search_space="baseline",
+    sarima_n_jobs=None,
+):
+    job = ForecastJob.from_params(
+        params,
+        n_jobs=n_jobs,
+        search=search,
+        max_evaluations=max_evaluations,
+        search_space=search_space,
+        sarima_auto=sarima_auto,
+        sarima_n_jobs=sarima_n_jobs,
+        rf_n_jobs=rf_n_jobs,
+        workers=workers,
+        n_splits=n_splits,
+        output_folder=output_folder_path,
+        use_cache=use_cache,
+    )
+    return job.run()
+
 
 if __name__ == "__main__":
     call_wrapper(sys.argv)